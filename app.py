@@ -1,109 +1,294 @@
-import os
-from flask import Flask, request, jsonify, render_template
-from groq import Groq
-from dotenv import load_dotenv
-import yt_dlp
+import time
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context, url_for
+from backends import BACKEND_NAMES, DEFAULT_BACKEND, get_backend
+from chunk_store import ChunkReader, write_chunk_store
+from chunker import chunk_transcript, write_subtitles
+from core import get_api_key, get_media_resolver, get_scheduler, get_search_index
+from downloader import download_audio_from_youtube
+from job_queue import DONE, FAILED, JobQueue
+from metrics import metrics
+from progress import ProgressBus, download_progress_hook, format_sse
+from search_index import document_id
+from streaming_pipeline import stream_transcribe
+from transcription_engine import (DEFAULT_RESPONSE_FORMAT, JOB_DEADLINE_SECONDS, transcribe_long_audio,
+                                  transcript_to_dict)
+from transcript_cache import TranscriptCache, hash_file, make_key, transcription_params
+from workspace import workspaces
 
-# Load environment variables from the .env file
-load_dotenv()
+# Fail fast if the API key is missing; the client itself is built on first use
+if DEFAULT_BACKEND in ("groq", "auto"):
+    get_api_key()
 
-# Retrieve the API key from the environment
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# Initialize Flask app
+app = Flask(__name__)
 
-# Ensure the API key is available
-if not GROQ_API_KEY:
-    raise ValueError("GROQ_API_KEY is not set in the .env file!")
+# Transcription settings used for every request, also part of the cache key.
+# No fixed prompt: the language router prompts each segment with the text before it
+TRANSCRIPTION_PROMPT = None
 
-# Initialize the Groq client with the API key
-client = Groq(api_key=GROQ_API_KEY)
+def backend_params(backend):
+    # Each backend's model gets its own cache entries
+    return transcription_params(backend.model, prompt=TRANSCRIPTION_PROMPT, response_format=DEFAULT_RESPONSE_FORMAT)
 
-# Initialize Flask app
-app = Flask(__name__)
+# Cache of finished transcripts, keyed by audio hash and transcription settings
+transcript_cache = TranscriptCache()
 
-# Function to download YouTube video and extract audio
-def download_audio_from_youtube(url, output_folder="downloads"):
-    print("Starting download of audio from YouTube...")
-    os.makedirs(output_folder, exist_ok=True)
-
-    # Set options to download only audio
-    ydl_opts = {
-        'format': 'bestaudio/best',
-        'outtmpl': os.path.join(output_folder, 'audio.%(ext)s'),
-        'postprocessors': [],
-        'ffmpeg_location': 'C:\\ProgramData\\chocolatey\\lib\\ffmpeg-full\\tools\\ffmpeg\\bin\\ffmpeg.exe',  # Updated path
-    }
+# Forward each transcribed segment to the job's event stream
+def segment_publisher(publish):
+    def on_segment(result):
+        publish("segment", {"index": result.index, "start": result.start, "end": result.end, "text": result.text})
+    return on_segment
 
+# Cache a finished transcript; one cut short by the job deadline is retried next time instead
+def cache_complete(cache_key, transcript, youtube_url, params):
+    if transcript.get("missing"):
+        print(f"Not caching partial transcript ({len(transcript['missing'])} missing spans)")
+        return
+    transcript_cache.put(cache_key, transcript)
+    transcript_cache.link_url(youtube_url, params, cache_key)
+
+# Return the transcript for a URL, reusing cached results where possible
+def get_transcript(youtube_url, workspace, publish, backend):
+    params = backend_params(backend)
+    # Repeat URLs are answered from the cache without downloading again
+    cached = transcript_cache.get_for_url(youtube_url, params)
+    if cached:
+        print(f"Cache hit for URL: {youtube_url}")
+        return cached, True
+    # One deadline for the whole job, whichever path ends up transcribing
+    deadline = time.monotonic() + JOB_DEADLINE_SECONDS if JOB_DEADLINE_SECONDS else None
+
+    # Transcribe while the audio is still streaming in; fall back to a full download
+    publish("status", {"stage": "streaming"})
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
-        print("Download completed. Audio extracted.")
+        transcription, audio_hash = stream_transcribe(
+            youtube_url, backend, on_segment=segment_publisher(publish), deadline=deadline)
     except Exception as e:
-        print(f"Error downloading audio: {e}")
-    
-    # Construct the full path to the audio file
-    audio_path = os.path.join(output_folder, 'audio.webm')
-    
-    # Check if the file exists
-    if not os.path.exists(audio_path):
-        print(f"Audio file not found: {audio_path}")
-        return None
-    
-    return audio_path
+        print(f"Streaming transcription failed, downloading instead: {e}")
+        # Tell clients to drop any segments the failed attempt already sent
+        publish("reset", {"reason": str(e)})
+    else:
+        # Keyed on the SHA-256 of the decoded 16 kHz PCM: the container bytes never reach this process.
+        # The download path below keys on the container file instead, so "same audio under another URL"
+        # only matches within one path; the URL link is what makes repeats of either path cache hits.
+        cache_key = make_key(audio_hash, params)
+        cached = transcript_to_dict(transcription)
+        cache_complete(cache_key, cached, youtube_url, params)
+        return cached, False
+
+    # Download audio from YouTube
+    publish("status", {"stage": "download"})
+    audio_filename = download_audio_from_youtube(youtube_url, workspace.path,
+                                                 progress_hook=download_progress_hook(publish))
+    if not audio_filename:
+        return None, False
+    print(f"Audio file downloaded and saved as: {audio_filename}")
+
+    # The same audio may already have been transcribed under another URL (by this download path:
+    # streamed transcripts are keyed on their decoded PCM, see above)
+    cache_key = make_key(hash_file(audio_filename), params)
+    cached = transcript_cache.get(cache_key)
+    if cached:
+        print(f"Cache hit for audio: {cache_key}")
+        transcript_cache.link_url(youtube_url, params, cache_key)
+    else:
+        # Split the audio on silences and transcribe the segments concurrently
+        print("Sending audio file for transcription...")
+        publish("status", {"stage": "transcribe"})
+        transcription = transcribe_long_audio(
+            audio_filename,
+            backend,
+            on_segment=segment_publisher(publish),
+            deadline=deadline,
+        )
+        cached = transcript_to_dict(transcription)
+        cache_complete(cache_key, cached, youtube_url, params)
+    return cached, False
+
+# Job handler: download, transcribe and write chunks for one URL
+def run_transcription_job(job_id, payload):
+    publish = progress_bus.publisher(job_id)
+    try:
+        result = transcribe_job(job_id, payload, publish)
+    except Exception as e:
+        publish("failed", {"error": str(e)})
+        raise
+    publish("done", result)
+    return result
+
+def transcribe_job(job_id, payload, publish):
+    youtube_url = payload["youtube_url"]
+    backend = get_backend(payload.get("backend"), prompt=TRANSCRIPTION_PROMPT)
+    # Each job downloads into its own scratch directory, removed when the job ends
+    with workspaces.create(job_id) as workspace:
+        transcript, cached = get_transcript(youtube_url, workspace, publish, backend)
+        output_dir = workspace.output_dir()
+    if not transcript:
+        raise RuntimeError("Audio file not found. Skipping transcription.")
+
+    # Access the transcription text directly
+    full_text = transcript["text"]  # Full transcription text
+    print("Transcription completed.")
+
+    # Group the timestamped segments into real 30-second windows
+    publish("status", {"stage": "write"})
+    with metrics.span("postprocess"):
+        chunks = chunk_transcript(transcript.get("segments"), transcript.get("words"))
+
+    # Save each chunk as text, plus subtitle and JSON versions of the whole transcript
+    with metrics.span("write"):
+        write_chunk_store(chunks, output_dir)
+        write_subtitles(chunks, output_dir)
+        # Searchable as soon as the job finishes; only this video's entries are touched
+        get_search_index().add_transcript(document_id(youtube_url), transcript, source=youtube_url)
+
+    return {
+        "transcription": full_text,
+        "chunks_saved": len(chunks),
+        "chunks": chunks,
+        "cached": cached,
+        "backend": backend.name,
+        "language": transcript.get("language"),
+        # Spans left out when the job hit its deadline (marked in the text as well)
+        "missing": transcript.get("missing") or [],
+        "output_dir": output_dir,
+    }
+
+# Live progress for running jobs, streamed to the page over server-sent events
+progress_bus = ProgressBus()
+
+# Background workers run the jobs so requests return immediately
+job_queue = JobQueue(run_transcription_job)
+
+def submit_job(youtube_url, backend=None):
+    if backend and backend not in BACKEND_NAMES:
+        return jsonify({"error": f"Unknown backend: {backend}"}), 400
+    job_id = job_queue.submit({"youtube_url": youtube_url, "backend": backend or DEFAULT_BACKEND})
+    print(f"Queued job {job_id} for URL: {youtube_url} ({backend or DEFAULT_BACKEND})")
+    return jsonify({
+        "job_id": job_id,
+        "status_url": url_for("job_status", job_id=job_id),
+        "result_url": url_for("job_result", job_id=job_id),
+        "events_url": url_for("job_events", job_id=job_id),
+    }), 202
 
 # Route to upload YouTube URL
 @app.route("/", methods=["GET", "POST"])
 def index():
     if request.method == "POST":
-        youtube_url = request.form["youtube_url"]
+        youtube_url = request.form.get("youtube_url")
         if youtube_url:
-            try:
-                # Download audio from YouTube
-                audio_filename = download_audio_from_youtube(youtube_url)
-                
-                if audio_filename:
-                    print(f"Audio file downloaded and saved as: {audio_filename}")
-
-                    # Open the audio file for transcription
-                    with open(audio_filename, "rb") as file:
-                        print("Sending audio file for transcription...")
-                        transcription = client.audio.transcriptions.create(
-                            file=(audio_filename, file.read()),  # Required audio file
-                            model="whisper-large-v3-turbo",  # Required model to use for transcription
-                            prompt="Specify context or spelling",  # Optional
-                            response_format="json",  # Optional
-                            temperature=0.0  # Optional
-                        )
-
-                    # Access the transcription text directly
-                    full_text = transcription.text  # Full transcription text
-                    print("Transcription completed.")
-
-                    # Approximate splitting into 30-second chunks
-                    words = full_text.split()  # Split the transcription into words
-                    words_per_30_sec = 70  # Approximate number of words in 30 seconds (adjust as needed)
-
-                    # Create a directory to save the output text files
-                    output_dir = os.path.join(os.path.dirname(__file__), "transcription_chunks")
-                    os.makedirs(output_dir, exist_ok=True)
-
-                    # Split and save chunks
-                    for i in range(0, len(words), words_per_30_sec):
-                        chunk_text = " ".join(words[i:i + words_per_30_sec])  # Get the next 30-second chunk
-                        chunk_filename = os.path.join(output_dir, f"chunk_{i // words_per_30_sec + 1}.txt")
-
-                        # Write the chunk to a text file
-                        with open(chunk_filename, "w", encoding="utf-8") as f:
-                            f.write(chunk_text)
-
-                    return jsonify({"transcription": full_text, "chunks_saved": len(words) // words_per_30_sec})
-                else:
-                    return jsonify({"error": "Audio file not found. Skipping transcription."})
-            except Exception as e:
-                return jsonify({"error": str(e)})
+            return submit_job(youtube_url, request.form.get("backend"))
         else:
-            return jsonify({"error": "No URL provided."})
+            return jsonify({"error": "No URL provided."}), 400
+
+    return render_template("index.html", backends=BACKEND_NAMES, default_backend=DEFAULT_BACKEND)
+
+# Route to submit a job from API clients (JSON or form body)
+@app.route("/jobs", methods=["POST"])
+def create_job():
+    body = request.get_json(silent=True) or request.form
+    youtube_url = body.get("youtube_url")
+    if not youtube_url:
+        return jsonify({"error": "No URL provided."}), 400
+    return submit_job(youtube_url, body.get("backend"))
+
+# Route to poll a job's status
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = job_queue.status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    return jsonify(job)
+
+# Route to fetch a finished job's result
+@app.route("/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    if job["status"] == FAILED:
+        return jsonify({"status": job["status"], "error": job["error"]}), 500
+    if job["status"] != DONE:
+        return jsonify({"status": job["status"]}), 202
+    return jsonify(job["result"])
+
+# Route for random access to one chunk of a finished job
+@app.route("/jobs/<job_id>/chunks/<int:index>", methods=["GET"])
+def job_chunk(job_id, index):
+    job = job_queue.status(job_id)
+    if job is None or job["status"] != DONE:
+        return jsonify({"error": "Unknown or unfinished job."}), 404
+    with ChunkReader(workspaces.output_path(job_id)) as reader:
+        if not 0 <= index < len(reader):
+            return jsonify({"error": "No such chunk."}), 404
+        return jsonify(reader.get(index))
+
+# Route streaming a job's progress and partial transcript as server-sent events
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    job = job_queue.status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    try:
+        last_event_id = int(request.headers.get("Last-Event-ID") or request.args.get("last_event_id") or 0)
+    except ValueError:
+        # Not an id this server issued: replay from the start
+        last_event_id = 0
+
+    def stream():
+        if not progress_bus.has_history(job_id) and job["status"] in (DONE, FAILED):
+            # Finished before this process started (or history expired): just report the outcome
+            final = job_queue.get(job_id)
+            if final["status"] == DONE:
+                yield format_sse({"id": 1, "event": "done", "data": final["result"]})
+            else:
+                yield format_sse({"id": 1, "event": "failed", "data": {"error": final["error"]}})
+            return
+        for item in progress_bus.subscribe(job_id, last_event_id):
+            yield format_sse(item)
+
+    return Response(stream_with_context(stream()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Route exposing stage timings and counters in Prometheus text format
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    scheduler = get_scheduler()
+    cache = transcript_cache.stats()
+    gauges = {
+        "transcription_queue_waiters": scheduler.saturation(),
+        "transcription_rate_limited": scheduler.stats["rate_limited"],
+        "transcription_retries": scheduler.stats["retries"],
+        "transcript_cache_hits": cache["hits"],
+        "transcript_cache_misses": cache["misses"],
+        "transcript_cache_bytes": cache["bytes"],
+    }
+    return Response(metrics.render_prometheus(gauges), mimetype="text/plain; version=0.0.4")
+
+# Route for phrase search across every indexed transcript, with millisecond offsets
+@app.route("/search", methods=["GET"])
+def search():
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "Missing query parameter q"}), 400
+    try:
+        limit = int(request.args.get("limit", 20))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    started = time.perf_counter()
+    hits = get_search_index().search(query, limit=limit, video_id=request.args.get("video_id"))
+    return jsonify({
+        "query": query,
+        "hits": hits,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+    })
 
-    return render_template("index.html")
+# Route to inspect cache effectiveness
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify(dict(transcript_cache.stats(), media_info=get_media_resolver().stats,
+                        search_index=get_search_index().stats()))
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,92 @@
+import io
+import os
+
+# Whisper resamples everything to 16 kHz mono, so anything more is wasted upload
+TARGET_SAMPLE_RATE = 16000
+TARGET_CHANNELS = 1
+
+# Opus in Ogg is accepted by the API and is ~15x smaller than 16 kHz WAV for speech
+UPLOAD_FORMAT = os.getenv("UPLOAD_FORMAT", "ogg")
+UPLOAD_CODEC = os.getenv("UPLOAD_CODEC", "libopus")
+UPLOAD_BITRATE = os.getenv("UPLOAD_BITRATE", "32k")
+
+# Leading/trailing audio quieter than this (relative to the file average) is trimmed
+TRIM_SILENCE_OFFSET_DB = 20
+TRIM_CHUNK_MS = 10
+
+
+def downmix_and_resample(audio):
+    """Mono, 16 kHz, 16-bit copy of a pydub AudioSegment"""
+    if audio.channels != TARGET_CHANNELS:
+        audio = audio.set_channels(TARGET_CHANNELS)
+    if audio.frame_rate != TARGET_SAMPLE_RATE:
+        audio = audio.set_frame_rate(TARGET_SAMPLE_RATE)
+    if audio.sample_width != 2:
+        audio = audio.set_sample_width(2)
+    return audio
+
+
+def trim_silence(audio):
+    """Strip leading and trailing silence; returns (trimmed audio, milliseconds removed from the start)"""
+    from pydub.silence import detect_leading_silence
+
+    if len(audio) == 0 or audio.dBFS == float("-inf"):
+        return audio, 0
+    threshold = audio.dBFS - TRIM_SILENCE_OFFSET_DB
+    lead = detect_leading_silence(audio, silence_threshold=threshold, chunk_size=TRIM_CHUNK_MS)
+    tail = detect_leading_silence(audio.reverse(), silence_threshold=threshold, chunk_size=TRIM_CHUNK_MS)
+    if lead + tail >= len(audio):
+        return audio, 0
+    return audio[lead:len(audio) - tail], lead
+
+
+def preprocess(audio, trim=False):
+    """Downmix/resample and optionally trim; returns (audio, leading offset in ms)"""
+    audio = downmix_and_resample(audio)
+    if trim:
+        return trim_silence(audio)
+    return audio, 0
+
+
+def encode(audio, format=UPLOAD_FORMAT, codec=UPLOAD_CODEC, bitrate=UPLOAD_BITRATE):
+    """Encode an AudioSegment to upload-ready bytes"""
+    buffer = io.BytesIO()
+    if format == "wav":
+        audio.export(buffer, format="wav")
+    else:
+        audio.export(buffer, format=format, codec=codec, bitrate=bitrate)
+    return buffer.getvalue()
+
+
+def encode_file(audio, path, format=UPLOAD_FORMAT, codec=UPLOAD_CODEC, bitrate=UPLOAD_BITRATE):
+    """Encode an AudioSegment straight into a file, so the upload never sits in memory; returns path"""
+    if format == "wav":
+        audio.export(path, format="wav").close()
+    else:
+        audio.export(path, format=format, codec=codec, bitrate=bitrate).close()
+    return path
+
+
+def pcm_audio(pcm, sample_rate=TARGET_SAMPLE_RATE):
+    """AudioSegment over raw 16-bit mono PCM (as produced by the streaming decoder)"""
+    from pydub import AudioSegment
+
+    return AudioSegment(data=pcm, sample_width=2, frame_rate=sample_rate, channels=TARGET_CHANNELS)
+
+
+def encode_pcm(pcm, sample_rate=TARGET_SAMPLE_RATE, format=UPLOAD_FORMAT):
+    """Encode raw 16-bit mono PCM (as produced by the streaming decoder)"""
+    return encode(pcm_audio(pcm, sample_rate), format=format)
+
+
+def preprocess_file(input_path, output_path=None, trim=False, format=UPLOAD_FORMAT):
+    """Write a compact upload-ready copy of input_path; returns (output path, leading offset in ms)"""
+    from pydub import AudioSegment
+
+    audio, offset_ms = preprocess(AudioSegment.from_file(input_path), trim=trim)
+    output_path = output_path or f"{os.path.splitext(input_path)[0]}.16k.{format}"
+    with open(output_path, "wb") as f:
+        f.write(encode(audio, format=format))
+    print(f"Preprocessed {input_path} ({os.path.getsize(input_path)} bytes) "
+          f"to {output_path} ({os.path.getsize(output_path)} bytes)")
+    return output_path, offset_ms
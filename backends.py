@@ -0,0 +1,219 @@
+import os
+import threading
+import time
+
+from core import LOCAL_COMPUTE_TYPE, LOCAL_WHISPER_MODEL, get_local_whisper_model, get_scheduler, get_transcriber
+from metrics import metrics
+from rate_limiter import CallCancelled
+from spool import open_payload, payload_digest
+from transcription_engine import DEFAULT_MODEL
+
+# groq, local, fake or auto (Groq, falling back to local while Groq is saturated)
+DEFAULT_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "groq")
+
+# Concurrent local transcriptions; each one keeps CPU cores busy
+LOCAL_WORKERS = int(os.getenv("LOCAL_WORKERS", 1))
+# The remote backend counts as saturated once this many calls are queued for quota
+FALLBACK_QUEUE_DEPTH = int(os.getenv("FALLBACK_QUEUE_DEPTH", 8))
+
+
+class TranscriptionBackend:
+    """A transcribe(filename, data, **options) callable with a name and model id.
+
+    Responses are anything the engine's response_field() understands: an object
+    or dict with "text" and optionally "segments", "words" and "language".
+    """
+    name = "base"
+    model = None
+
+    def transcribe(self, filename, data, **options):
+        raise NotImplementedError
+
+    def saturated(self):
+        return False
+
+    def __call__(self, filename, data, **options):
+        return self.transcribe(filename, data, **options)
+
+
+class GroqBackend(TranscriptionBackend):
+    name = "groq"
+
+    def __init__(self, priority=None, model=DEFAULT_MODEL, **kwargs):
+        self.model = model
+        self._transcribe = get_transcriber(priority=priority, model=model, **kwargs)
+
+    def transcribe(self, filename, data, **options):
+        return self._transcribe(filename, data, **options)
+
+    def saturated(self):
+        scheduler = get_scheduler()
+        return scheduler.paused() or scheduler.saturation() >= FALLBACK_QUEUE_DEPTH
+
+
+def local_model_id(model=LOCAL_WHISPER_MODEL, compute_type=LOCAL_COMPUTE_TYPE):
+    return f"faster-whisper:{model}:{compute_type}"
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """CPU-only Whisper through faster-whisper; the model is loaded once per process"""
+    name = "local"
+
+    def __init__(self, model=LOCAL_WHISPER_MODEL, compute_type=LOCAL_COMPUTE_TYPE, workers=LOCAL_WORKERS,
+                 prompt=None, language=None, **kwargs):
+        self.model = local_model_id(model, compute_type)
+        self.model_size = model
+        self.compute_type = compute_type
+        self.prompt = prompt
+        self.language = language
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(workers)
+        # Slots currently held, for saturated(); the semaphore does not expose its count
+        self._busy = 0
+        self._lock = threading.Lock()
+
+    def _hold_slot(self, delta):
+        with self._lock:
+            self._busy += delta
+
+    def transcribe(self, filename, data, **options):
+        with self._slots:
+            self._hold_slot(1)
+            try:
+                return self._transcribe(filename, data, options)
+            finally:
+                self._hold_slot(-1)
+
+    def _transcribe(self, filename, data, options):
+        model = get_local_whisper_model(self.model_size, self.compute_type)
+        with metrics.span("transcribe"), open_payload(data) as audio:
+            segments, info = model.transcribe(
+                audio,
+                language=options.get("language") or self.language,
+                initial_prompt=options.get("prompt") or self.prompt,
+                temperature=0.0,
+            )
+            # segments is a lazy generator: decoding happens while it is consumed, so a
+            # cancelled call stops between segments instead of running to the end
+            cancel = options.get("cancel")
+            decoded = []
+            for segment in segments:
+                if cancel is not None and cancel.is_set():
+                    raise CallCancelled()
+                decoded.append({"start": segment.start, "end": segment.end, "text": segment.text.strip()})
+            segments = decoded
+        metrics.count("pipeline_segments_total", backend="local")
+        return {
+            "text": " ".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": info.language,
+            "duration": info.duration,
+        }
+
+    def saturated(self):
+        # Every slot busy
+        with self._lock:
+            return self._busy >= self.workers
+
+
+class FakeBackend(TranscriptionBackend):
+    """Deterministic stand-in for tests and benchmarks: same input, same output, fixed latency"""
+    name = "fake"
+
+    def __init__(self, latency=0.0, seconds_per_segment=5.0, language="en", **kwargs):
+        self.model = "fake"
+        self.latency = latency
+        self.seconds_per_segment = seconds_per_segment
+        self.language = language
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def transcribe(self, filename, data, **options):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            cancel = options.get("cancel")
+            if cancel is None:
+                time.sleep(self.latency)
+            elif cancel.wait(self.latency):
+                raise CallCancelled()
+        digest = payload_digest(data)[:8]
+        duration = options.get("duration") or self.seconds_per_segment
+        segments = []
+        start = 0.0
+        while start < duration:
+            end = min(duration, start + self.seconds_per_segment)
+            segments.append({"start": start, "end": end, "text": f"{filename} {digest} {start:.0f}s"})
+            start = end
+        return {
+            "text": " ".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": options.get("language") or self.language,
+            "duration": duration,
+        }
+
+
+class FallbackBackend(TranscriptionBackend):
+    """Use the primary backend, switching to the fallback while it is saturated or failing"""
+    name = "auto"
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+        self.model = f"{primary.model}|{fallback.model}"
+        self.stats = {"primary": 0, "fallback": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def transcribe(self, filename, data, **options):
+        if not self.primary.saturated():
+            try:
+                result = self.primary.transcribe(filename, data, **options)
+                self._count("primary")
+                return result
+            except CallCancelled:
+                # Abandoned by the caller, not failed: the fallback is not wanted either
+                raise
+            except Exception as e:
+                # The scheduler already retried; give the segment to the fallback instead
+                print(f"{self.primary.name} backend failed ({e}), using {self.fallback.name}")
+        self._count("fallback")
+        return self.fallback.transcribe(filename, data, **options)
+
+    def saturated(self):
+        return self.primary.saturated() and self.fallback.saturated()
+
+
+# Names accepted per job by the web app, the batch CLI and the Streamlit UI
+BACKENDS = {
+    "groq": GroqBackend,
+    "local": LocalWhisperBackend,
+    "fake": FakeBackend,
+}
+BACKEND_NAMES = tuple(BACKENDS) + ("auto",)
+
+
+def get_backend(name=None, priority=None, **kwargs):
+    """Build the named backend; "auto" is Groq with local fallback"""
+    name = name or DEFAULT_BACKEND
+    if name == "auto":
+        return FallbackBackend(GroqBackend(priority=priority, **kwargs), LocalWhisperBackend(**kwargs))
+    if name == "groq":
+        return GroqBackend(priority=priority, **kwargs)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend: {name}")
+    return BACKENDS[name](**kwargs)
+
+
+def backend_model(name=None):
+    """Model id the named backend would report, without building it (no client, no model load)"""
+    name = name or DEFAULT_BACKEND
+    models = {"groq": DEFAULT_MODEL, "local": local_model_id(), "fake": "fake"}
+    if name == "auto":
+        return f"{models['groq']}|{models['local']}"
+    if name not in models:
+        raise ValueError(f"Unknown transcription backend: {name}")
+    return models[name]
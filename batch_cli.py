@@ -0,0 +1,214 @@
+"""Transcribe many videos or files in one go.
+
+Sources can be YouTube video or playlist URLs, local audio files, directories
+or glob patterns, and @file.txt lists of any of those (one per line). Progress
+is recorded in a JSON manifest; re-running with the same manifest skips items
+that already completed.
+
+    python batch_cli.py https://www.youtube.com/playlist?list=... --manifest run.json
+    python batch_cli.py @urls.txt "recordings/*.mp3" --transcribe-workers 8
+"""
+import argparse
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from chunk_store import write_chunk_store
+from chunker import chunk_transcript, write_subtitles
+from backends import BACKEND_NAMES, get_backend
+from core import get_media_resolver, get_search_index
+from downloader import download_audio_from_youtube
+from rate_limiter import BATCH
+from search_index import document_id
+from transcription_engine import transcribe_long_audio, transcript_to_dict
+from workspace import workspaces
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a", ".mp4", ".webm", ".opus", ".ogg", ".flac")
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+# Finished at the job deadline with gaps; not done, so the next run retries it
+PARTIAL = "partial"
+
+
+def is_url(source):
+    return source.startswith(("http://", "https://"))
+
+
+def expand_playlist(url):
+    """Video URLs of a playlist, without resolving each video"""
+    entries = get_media_resolver().expand_playlist(url)
+    if not entries:
+        return [url]
+    urls = []
+    for entry in entries:
+        if not entry:
+            continue
+        video_url = entry.get("url") or entry.get("webpage_url")
+        if not is_url(video_url or "") and entry.get("id"):
+            video_url = f"https://www.youtube.com/watch?v={entry['id']}"
+        if video_url:
+            urls.append(video_url)
+    print(f"Expanded playlist {url} into {len(urls)} videos")
+    return urls
+
+
+def expand_source(source):
+    if source.startswith("@"):
+        items = []
+        with open(source[1:], "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    items.extend(expand_source(line))
+        return items
+    if is_url(source):
+        if "list=" in source or "/playlist" in source:
+            return expand_playlist(source)
+        return [source]
+    if os.path.isdir(source):
+        source = os.path.join(source, "**", "*")
+    paths = sorted(glob.glob(source, recursive=True)) if glob.has_magic(source) else [source]
+    return [os.path.abspath(path) for path in paths
+            if os.path.isfile(path) and path.lower().endswith(AUDIO_EXTENSIONS)]
+
+
+class Manifest:
+    """Per-item status and timings, rewritten atomically after every change"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.items = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.items = json.load(f).get("items", {})
+
+    def add(self, source):
+        with self._lock:
+            self.items.setdefault(source, {"source": source, "status": PENDING})
+
+    def is_done(self, source):
+        return self.items.get(source, {}).get("status") == DONE
+
+    def update(self, source, **fields):
+        with self._lock:
+            self.items[source].update(fields)
+            self._save()
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"updated_at": time.time(), "items": self.items}, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+    def summary(self):
+        counts = {}
+        for item in self.items.values():
+            counts[item["status"]] = counts.get(item["status"], 0) + 1
+        return counts
+
+
+class BatchRunner:
+    def __init__(self, manifest, download_workers=2, transcribe_workers=4, segment_workers=4, backend=None):
+        self.manifest = manifest
+        self.segment_workers = segment_workers
+        # Downloads and transcriptions are bounded separately so one cannot starve the other
+        self.download_slots = threading.Semaphore(download_workers)
+        self.transcribe_slots = threading.Semaphore(transcribe_workers)
+        self.max_items = download_workers + transcribe_workers
+        # Batch work yields to interactive jobs sharing the same quota
+        self.transcribe_fn = get_backend(backend, priority=BATCH)
+
+    def process(self, source):
+        timings = {}
+        started = time.perf_counter()
+        self.manifest.update(source, status="running", started_at=time.time(), error=None)
+        with workspaces.create() as workspace:
+            audio_path = source
+            if is_url(source):
+                with self.download_slots:
+                    step = time.perf_counter()
+                    audio_path = download_audio_from_youtube(source, workspace.path)
+                    timings["download"] = round(time.perf_counter() - step, 3)
+                if not audio_path:
+                    raise RuntimeError("Audio file not found after download")
+
+            with self.transcribe_slots:
+                step = time.perf_counter()
+                transcript = transcribe_long_audio(audio_path, self.transcribe_fn,
+                                                   max_workers=self.segment_workers)
+                timings["transcribe"] = round(time.perf_counter() - step, 3)
+
+            step = time.perf_counter()
+            output_dir = workspace.output_dir()
+            chunks = chunk_transcript(transcript.segments, transcript.words)
+            write_chunk_store(chunks, output_dir)
+            write_subtitles(chunks, output_dir)
+            get_search_index().add_transcript(document_id(source), transcript_to_dict(transcript), source=source)
+            timings["write"] = round(time.perf_counter() - step, 3)
+
+        timings["total"] = round(time.perf_counter() - started, 3)
+        self.manifest.update(source, status=PARTIAL if transcript.missing else DONE, finished_at=time.time(),
+                             timings=timings, output_dir=output_dir, chunks=len(chunks),
+                             duration=transcript.duration, sent_seconds=round(transcript.sent_seconds, 3),
+                             missing=transcript.missing)
+
+    def run_one(self, source):
+        try:
+            self.process(source)
+            print(f"Done: {source}")
+        except Exception as e:
+            traceback.print_exc()
+            self.manifest.update(source, status=FAILED, finished_at=time.time(), error=str(e))
+            print(f"Failed: {source}: {e}")
+
+    def run(self, sources):
+        pending = [source for source in sources if not self.manifest.is_done(source)]
+        print(f"{len(sources) - len(pending)} already done, {len(pending)} to process")
+        with ThreadPoolExecutor(max_workers=self.max_items) as executor:
+            list(executor.map(self.run_one, pending))
+        return self.manifest.summary()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="+", help="URLs, playlist URLs, files, directories, globs or @list.txt")
+    parser.add_argument("--manifest", default="batch_manifest.json", help="Progress file, reused to resume")
+    parser.add_argument("--download-workers", type=int, default=2, help="Concurrent downloads")
+    parser.add_argument("--transcribe-workers", type=int, default=4, help="Concurrent items being transcribed")
+    parser.add_argument("--segment-workers", type=int, default=4, help="Concurrent API calls per item")
+    parser.add_argument("--backend", choices=BACKEND_NAMES, default=None,
+                        help="Transcription backend (default: TRANSCRIPTION_BACKEND or groq)")
+    parser.add_argument("--skip-failed", action="store_true", help="Do not retry items that failed before")
+    args = parser.parse_args(argv)
+
+    sources = []
+    for source in args.sources:
+        for item in expand_source(source):
+            if item not in sources:
+                sources.append(item)
+
+    manifest = Manifest(args.manifest)
+    for source in sources:
+        manifest.add(source)
+    if args.skip_failed:
+        sources = [source for source in sources if manifest.items[source]["status"] != FAILED]
+
+    runner = BatchRunner(manifest, download_workers=args.download_workers,
+                         transcribe_workers=args.transcribe_workers, segment_workers=args.segment_workers,
+                         backend=args.backend)
+    summary = runner.run(sources)
+    print(f"Batch finished: {summary}. Manifest written to {args.manifest}")
+    return 0 if not summary.get(FAILED) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,48 @@
+"""Wall-clock speedup of segmented transcription against a local stand-in endpoint.
+
+Run with: python benchmarks/bench_parallel_transcription.py
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import FakeBackend
+from transcription_engine import Segment, stitch_results, transcribe_segments
+
+
+def make_segments(count, segment_seconds):
+    return [
+        Segment(index=i, start=i * segment_seconds, end=(i + 1) * segment_seconds,
+                filename=f"segment_{i:04d}.mp3", data=b"\0" * 1024)
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--segments", type=int, default=24)
+    parser.add_argument("--segment-seconds", type=float, default=300.0)
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated seconds per API call")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    segments = make_segments(args.segments, args.segment_seconds)
+    # Stands in for the remote API: fixed latency per upload, deterministic text
+    transcribe = FakeBackend(latency=args.latency)
+
+    baseline = None
+    print(f"{'workers':>8} {'seconds':>9} {'speedup':>8}")
+    for workers in args.workers:
+        started = time.perf_counter()
+        transcript = stitch_results(transcribe_segments(segments, transcribe, max_workers=workers))
+        elapsed = time.perf_counter() - started
+        assert transcript.text.startswith("segment_0000")
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>9.2f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""End-to-end pipeline benchmark against local fixtures and the fake Groq server.
+
+Every configuration (audio length x concurrency) runs in a fresh subprocess so
+peak RSS and the quota scheduler start clean. Each job goes through the real
+pipeline: the "download" copies a synthetic WAV fixture into a workspace,
+then the file is preprocessed, VAD-gated, split, uploaded to
+benchmarks/fake_groq_server.py over HTTP, chunked and written to a chunk store.
+
+Reported per configuration: audio throughput (x realtime), jobs/s, p50/p99 job
+latency, peak RSS, bytes uploaded and hedged calls. With --hedging both (the
+default) every configuration runs with and without straggler hedging, so the
+p99 of the two can be compared; --straggler-rate makes the fake server stall
+some calls. Use --save-baseline once, then --baseline to fail (exit 1) when a
+later run regresses past --tolerance.
+
+Run with: python benchmarks/bench_pipeline.py --minutes 1 5 --concurrency 1 4
+Opus/Ogg uploads need ffmpeg on PATH; --format wav runs without it.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def make_fixture(directory, minutes):
+    from bench_preprocess import synthetic_wav
+
+    path = os.path.join(directory, f"fixture_{minutes:g}min.wav")
+    if not os.path.exists(path):
+        with open(path, "wb") as f:
+            f.write(synthetic_wav(minutes))
+    return path
+
+
+def run_one(args):
+    """Child process: one configuration, result printed as JSON on the last line"""
+    from fake_groq_server import start_server
+
+    server, fake, base_url = start_server(latency=args.latency, seconds_per_mb=args.seconds_per_mb,
+                                          realtime_factor=args.realtime_factor, jitter=args.jitter,
+                                          rpm=args.rpm, error_rate=args.error_rate,
+                                          straggler_rate=args.straggler_rate,
+                                          straggler_seconds=args.straggler_seconds, seed=args.seed)
+    os.environ["GROQ_BASE_URL"] = base_url
+
+    from backends import get_backend
+    from chunk_store import write_chunk_store
+    from chunker import chunk_transcript, write_subtitles
+    from metrics import metrics
+    from transcription_engine import transcribe_long_audio
+    from workspace import WorkspaceManager
+
+    scratch = tempfile.mkdtemp(prefix="bench_pipeline_")
+    manager = WorkspaceManager(os.path.join(scratch, "downloads"), os.path.join(scratch, "output"))
+    backend = get_backend("groq")
+
+    def job(index):
+        started = time.perf_counter()
+        with manager.create(f"job{index}") as workspace:
+            # Stand-in for the YouTube download: copy the local fixture in
+            with metrics.span("download"):
+                audio_path = workspace.file(os.path.basename(args.fixture))
+                shutil.copyfile(args.fixture, audio_path)
+            metrics.count("pipeline_bytes_total", os.path.getsize(audio_path), direction="downloaded")
+            transcript = transcribe_long_audio(audio_path, backend, max_workers=args.segment_workers,
+                                               max_segment_seconds=args.segment_seconds)
+            with metrics.span("postprocess"):
+                chunks = chunk_transcript(transcript.segments, transcript.words)
+            with metrics.span("write"):
+                output_dir = workspace.output_dir()
+                write_chunk_store(chunks, output_dir)
+                write_subtitles(chunks, output_dir)
+        return time.perf_counter() - started, transcript.duration
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        outcomes = list(executor.map(job, range(args.jobs)))
+    wall = time.perf_counter() - started
+    server.shutdown()
+    shutil.rmtree(scratch, ignore_errors=True)
+
+    latencies = [latency for latency, _ in outcomes]
+    audio_seconds = sum(duration for _, duration in outcomes)
+    summary = metrics.summary()
+    counters = summary["counters"]
+    result = {
+        "wall_seconds": wall,
+        "jobs": args.jobs,
+        "audio_seconds": audio_seconds,
+        "throughput_x_realtime": audio_seconds / wall,
+        "jobs_per_second": args.jobs / wall,
+        "p50_seconds": percentile(latencies, 0.50),
+        "p99_seconds": percentile(latencies, 0.99),
+        "peak_rss_mb": peak_rss_mb(),
+        "bytes_uploaded": counters.get('pipeline_bytes_total{direction="uploaded"}', 0),
+        "hedges": {outcome: counters.get(f'pipeline_hedges_total{{outcome="{outcome}"}}', 0)
+                   for outcome in ("sent", "hedge_won", "primary_won")},
+        "server": fake.stats,
+        "stage_mean_seconds": {stage: entry["mean"] for stage, entry in summary["stages"].items()},
+    }
+    print(json.dumps(result))
+
+
+def run_config(args, fixture, concurrency, hedge):
+    command = [sys.executable, os.path.abspath(__file__), "--run-one", "--fixture", fixture,
+               "--concurrency", str(concurrency), "--jobs", str(args.jobs or concurrency * 2),
+               "--segment-workers", str(args.segment_workers), "--segment-seconds", str(args.segment_seconds),
+               "--latency", str(args.latency), "--seconds-per-mb", str(args.seconds_per_mb),
+               "--realtime-factor", str(args.realtime_factor), "--jitter", str(args.jitter),
+               "--rpm", str(args.rpm), "--error-rate", str(args.error_rate),
+               "--straggler-rate", str(args.straggler_rate), "--straggler-seconds", str(args.straggler_seconds),
+               "--seed", str(args.seed)]
+    env = dict(os.environ, GROQ_API_KEY=os.getenv("GROQ_API_KEY") or "benchmark", UPLOAD_FORMAT=args.format,
+               # The fake server enforces its own quota (--rpm); the client scheduler only paces audio
+               GROQ_REQUESTS_PER_MINUTE=str(args.client_rpm), GROQ_AUDIO_SECONDS_PER_HOUR="1e9",
+               # Benchmark runs are short: let the latency percentiles warm up sooner
+               HEDGE_REQUESTS="1" if hedge else "0", HEDGE_MIN_SAMPLES=str(args.hedge_min_samples))
+    completed = subprocess.run(command, env=env, capture_output=True, text=True, cwd=ROOT)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark run failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def check_regressions(results, baseline, tolerance):
+    """Messages for every metric that got worse than baseline by more than tolerance"""
+    failures = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if not reference:
+            continue
+        if result["throughput_x_realtime"] < reference["throughput_x_realtime"] * (1 - tolerance):
+            failures.append(f"{key}: throughput {result['throughput_x_realtime']:.2f}x "
+                            f"< baseline {reference['throughput_x_realtime']:.2f}x")
+        for metric in ("p99_seconds", "peak_rss_mb", "bytes_uploaded"):
+            if result.get(metric) and reference.get(metric) and result[metric] > reference[metric] * (1 + tolerance):
+                failures.append(f"{key}: {metric} {result[metric]:.2f} > baseline {reference[metric]:.2f}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 5], help="Fixture audio lengths")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4], help="Concurrent jobs")
+    parser.add_argument("--jobs", type=int, default=0, help="Jobs per configuration (default 2 x concurrency)")
+    parser.add_argument("--segment-workers", type=int, default=4)
+    parser.add_argument("--segment-seconds", type=int, default=60, help="Max seconds per uploaded segment")
+    parser.add_argument("--format", default="ogg", help="Upload format (ogg needs ffmpeg; wav does not)")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--seconds-per-mb", type=float, default=0.05)
+    parser.add_argument("--realtime-factor", type=float, default=0.002)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--rpm", type=int, default=0, help="Fake server quota (0: unlimited)")
+    parser.add_argument("--client-rpm", type=float, default=100000, help="Client-side request pacing")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--straggler-rate", type=float, default=0.0, help="Fraction of fake calls that stall")
+    parser.add_argument("--straggler-seconds", type=float, default=5.0, help="Extra seconds for a stalled call")
+    parser.add_argument("--hedging", default="both", choices=["both", "on", "off"],
+                        help="Run with straggler hedging, without it, or both for comparison")
+    parser.add_argument("--hedge-min-samples", type=int, default=5, help="Calls seen before hedging starts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against this JSON file and exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    # Internal: a single configuration, run in a child process
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--fixture", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        args.concurrency = args.concurrency[0]
+        return run_one(args)
+
+    # Runs without hedging are keyed with a _nohedge suffix, so both can share a baseline file
+    modes = {"both": [True, False], "on": [True], "off": [False]}[args.hedging]
+    fixtures = tempfile.mkdtemp(prefix="bench_fixtures_")
+    results = {}
+    print(f"{'config':<22} {'x realtime':>10} {'jobs/s':>7} {'p50 s':>7} {'p99 s':>7} "
+          f"{'RSS MB':>7} {'uploaded':>12} {'429s':>5} {'5xx':>4} {'won/hedged':>10}")
+    try:
+        for minutes in args.minutes:
+            fixture = make_fixture(fixtures, minutes)
+            for concurrency in args.concurrency:
+                for hedge in modes:
+                    key = f"{minutes:g}min_x{concurrency}" + ("" if hedge else "_nohedge")
+                    result = results[key] = run_config(args, fixture, concurrency, hedge)
+                    rss = f"{result['peak_rss_mb']:.0f}" if result["peak_rss_mb"] else "n/a"
+                    hedges = f"{result['hedges']['hedge_won']}/{result['hedges']['sent']}" if hedge else "-"
+                    print(f"{key:<22} {result['throughput_x_realtime']:>10.1f} {result['jobs_per_second']:>7.2f} "
+                          f"{result['p50_seconds']:>7.2f} {result['p99_seconds']:>7.2f} {rss:>7} "
+                          f"{result['bytes_uploaded']:>12,} {result['server']['rate_limited']:>5} "
+                          f"{result['server']['errors']:>4} {hedges:>10}")
+    finally:
+        shutil.rmtree(fixtures, ignore_errors=True)
+
+    for key in results:
+        unhedged = results.get(f"{key}_nohedge")
+        if unhedged:
+            print(f"{key}: p99 {results[key]['p99_seconds']:.2f}s with hedging, "
+                  f"{unhedged['p99_seconds']:.2f}s without")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            failures = check_regressions(results, json.load(f), args.tolerance)
+        if failures:
+            print("Performance regressions:")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
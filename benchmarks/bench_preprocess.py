@@ -0,0 +1,78 @@
+"""Upload size and end-to-end latency with and without audio pre-processing.
+
+Generates a synthetic 48 kHz stereo WAV (speech-like bursts separated by
+pauses), then compares uploading it as-is with downmixing to 16 kHz mono and
+re-encoding. Upload time is simulated from --bandwidth-mbps plus a fixed
+per-request latency, so the numbers are reproducible without the real API.
+Opus/Ogg output needs ffmpeg on PATH; use --format wav to run without it.
+
+Run with: python benchmarks/bench_preprocess.py --minutes 10
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_preprocess import encode, preprocess
+
+
+def synthetic_wav(minutes, sample_rate=48000, channels=2, seed=0):
+    rng = np.random.default_rng(seed)
+    samples = int(minutes * 60 * sample_rate)
+    t = np.arange(samples) / sample_rate
+    # Voiced bursts: a few harmonics with a slow syllable-rate envelope, plus pauses
+    signal = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((140, 280, 420, 1100)))
+    envelope = (np.sin(2 * np.pi * 3.0 * t) > 0).astype(np.float32)
+    pauses = (np.sin(2 * np.pi * 0.1 * t) > -0.6).astype(np.float32)
+    signal = signal * envelope * pauses + rng.normal(0, 0.01, samples)
+    pcm = (signal / np.max(np.abs(signal)) * 12000).astype(np.int16)
+    stereo = np.repeat(pcm[:, None], channels, axis=1)
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(stereo.tobytes())
+    return buffer.getvalue()
+
+
+def simulated_upload_seconds(size, bandwidth_mbps, latency):
+    return latency + size * 8 / (bandwidth_mbps * 1_000_000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=10)
+    parser.add_argument("--format", default="ogg", help="Upload format after pre-processing (ogg, flac, mp3, wav)")
+    parser.add_argument("--trim", action="store_true", help="Also trim leading/trailing silence")
+    parser.add_argument("--bandwidth-mbps", type=float, default=20.0)
+    parser.add_argument("--latency", type=float, default=0.3, help="Fixed seconds per upload request")
+    args = parser.parse_args()
+
+    from pydub import AudioSegment
+
+    raw = synthetic_wav(args.minutes)
+    raw_upload = simulated_upload_seconds(len(raw), args.bandwidth_mbps, args.latency)
+
+    started = time.perf_counter()
+    audio, _ = preprocess(AudioSegment.from_file(io.BytesIO(raw), format="wav"), trim=args.trim)
+    processed = encode(audio, format=args.format)
+    preprocess_seconds = time.perf_counter() - started
+    processed_upload = simulated_upload_seconds(len(processed), args.bandwidth_mbps, args.latency)
+
+    print(f"{'variant':<28} {'bytes':>12} {'prep s':>8} {'upload s':>9} {'total s':>8}")
+    print(f"{'as-is 48k stereo wav':<28} {len(raw):>12,} {0:>8.2f} {raw_upload:>9.2f} {raw_upload:>8.2f}")
+    print(f"{'16k mono ' + args.format:<28} {len(processed):>12,} {preprocess_seconds:>8.2f} "
+          f"{processed_upload:>9.2f} {preprocess_seconds + processed_upload:>8.2f}")
+    print(f"Upload is {len(raw) / len(processed):.1f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Cold-start import cost: eager module-level setup versus the lazy core module.
+
+"eager" reproduces what every script used to do at import time (load .env,
+import groq/yt-dlp/indic_transliteration, build the client); "lazy" imports the
+same entry points now that those are deferred to first use.
+
+Run with: python benchmarks/bench_startup.py
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = {
+    "eager (before)": (
+        "import os, re\n"
+        "from dotenv import load_dotenv\n"
+        "from groq import Groq\n"
+        "import yt_dlp\n"
+        "from indic_transliteration import sanscript\n"
+        "from indic_transliteration.sanscript import transliterate\n"
+        "load_dotenv()\n"
+        "Groq(api_key=os.getenv('GROQ_API_KEY') or 'benchmark')\n"
+    ),
+    "lazy core": "import core\ncore.get_api_key() if os.getenv('GROQ_API_KEY') else None\n",
+    "lazy downloader + engine": "import downloader, transcription_engine, streaming_pipeline, chunker\n",
+    "lazy app": "import app\n",
+    "first get_client()": "import core\ncore.get_client()\n",
+}
+
+
+def time_import(code, env):
+    program = (
+        "import os, time\n"
+        "started = time.perf_counter()\n"
+        f"{code}"
+        "print(time.perf_counter() - started)\n"
+    )
+    output = subprocess.run([sys.executable, "-c", program], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("GROQ_API_KEY", "benchmark")
+
+    print(f"{'case':<28} {'median ms':>10} {'min ms':>8}")
+    for name, code in CASES.items():
+        try:
+            timings = [time_import(code, env) for _ in range(args.runs)]
+        except subprocess.CalledProcessError as e:
+            print(f"{name:<28} failed: {e.stderr.strip().splitlines()[-1]}")
+            continue
+        print(f"{name:<28} {statistics.median(timings) * 1000:>10.1f} {min(timings) * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
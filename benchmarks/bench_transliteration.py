@@ -0,0 +1,79 @@
+"""Tamil -> Tanglish transliteration on a large synthetic multi-hour transcript.
+
+"baseline" is what streamlit_poc.py used to do on every rerun: compile the
+Tamil regex, transliterate the whole transcript in one call and re-split it.
+"chunked" is the transliteration module: per-chunk, memoised tokens/lines,
+non-Tamil runs skipped, several schemes produced in the same pass.
+
+Run with: python benchmarks/bench_transliteration.py --hours 3
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transliteration import cache_info, transliterate_chunks
+
+TAMIL_WORDS = ["வணக்கம்", "நன்றி", "காதல்", "பாடல்", "இசை", "உலகம்", "நான்", "நீ", "என்", "உன்",
+               "கண்ணே", "மனம்", "வாழ்க்கை", "இரவு", "நிலா", "மழை", "கனவு", "நெஞ்சம்", "அன்பு", "தமிழ்"]
+ENGLISH_WORDS = ["okay", "so", "music", "baby", "love", "yeah", "the", "song", "video", "like"]
+WORDS_PER_MINUTE = 150
+WORDS_PER_CHUNK = 70
+
+
+def synthetic_chunks(hours, english_ratio=0.2, seed=0):
+    rng = random.Random(seed)
+    total = int(hours * 60 * WORDS_PER_MINUTE)
+    words = [rng.choice(ENGLISH_WORDS) if rng.random() < english_ratio else rng.choice(TAMIL_WORDS)
+             for _ in range(total)]
+    return [{"index": i // WORDS_PER_CHUNK, "start": i / WORDS_PER_MINUTE * 60, "end": 0.0,
+             "text": " ".join(words[i:i + WORDS_PER_CHUNK])}
+            for i in range(0, total, WORDS_PER_CHUNK)]
+
+
+def baseline(chunks, schemes):
+    from indic_transliteration import sanscript
+
+    text = " ".join(chunk["text"] for chunk in chunks)
+    results = {}
+    for scheme in schemes:
+        if re.compile(r'[\u0B80-\u0BFF]').search(text):
+            tanglish = sanscript.transliterate(text, sanscript.TAMIL, scheme)
+            words = tanglish.split()
+            results[scheme] = [" ".join(words[i:i + WORDS_PER_CHUNK]) for i in range(0, len(words), WORDS_PER_CHUNK)]
+    return results
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=3)
+    parser.add_argument("--schemes", nargs="+", default=["itrans", "iso", "iast"])
+    parser.add_argument("--reruns", type=int, default=3, help="Simulated Streamlit reruns")
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args.hours)
+    words = sum(len(chunk["text"].split()) for chunk in chunks)
+    print(f"{args.hours} h transcript: {words:,} words in {len(chunks):,} chunks, schemes {args.schemes}")
+
+    base = [timed(baseline, chunks, args.schemes) for _ in range(args.reruns)]
+    fast = [timed(transliterate_chunks, chunks, args.schemes) for _ in range(args.reruns)]
+
+    print(f"{'run':>4} {'baseline s':>11} {'chunked s':>10}")
+    for run, (b, f) in enumerate(zip(base, fast), 1):
+        print(f"{run:>4} {b:>11.3f} {f:>10.3f}")
+    print(f"First run speedup {base[0] / fast[0]:.1f}x, rerun speedup {base[-1] / fast[-1]:.1f}x")
+    print(f"Cache: {cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
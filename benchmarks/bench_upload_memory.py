@@ -0,0 +1,161 @@
+"""Peak memory of one transcription job as the input file grows.
+
+Runs transcribe_long_audio on 16 kHz mono WAV fixtures of increasing length,
+uploading through the real Groq client to benchmarks/fake_groq_server.py
+(started in its own process so its buffers are not counted). Each run is a
+fresh subprocess and reports the tracemalloc peak and the growth in peak RSS
+over the post-import baseline, for two modes:
+
+    in-memory  whole file decoded at once, segments held as bytes
+    spooled    segments spooled to disk and sent as file handles, large files
+               decoded as a stream (the defaults)
+
+With --max-growth, exits 1 if the spooled peak on the largest file exceeds the
+smallest file's by more than that fraction.
+
+Run with: python benchmarks/bench_upload_memory.py --minutes 10 30 90
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+MODES = {
+    "in-memory": {"SPOOL_UPLOADS": "0", "STREAM_DECODE_BYTES": "0"},
+    "spooled": {"SPOOL_UPLOADS": "1"},
+}
+
+
+def rss_mb():
+    """Current and peak RSS of this process (Linux /proc), in MB"""
+    values = {}
+    with open("/proc/self/status", encoding="ascii") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                values[line.split(":")[0]] = int(line.split()[1]) / 1024
+    return values.get("VmRSS", 0.0), values.get("VmHWM", 0.0)
+
+
+def write_fixture(directory, minutes):
+    """16 kHz mono WAV of the given length, written a minute at a time"""
+    from bench_preprocess import synthetic_wav
+
+    path = os.path.join(directory, f"fixture_{minutes:g}min.wav")
+    if os.path.exists(path):
+        return path
+    with wave.open(io.BytesIO(synthetic_wav(1, sample_rate=16000, channels=1)), "rb") as source:
+        minute = source.readframes(source.getnframes())
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        whole, rest = divmod(minutes, 1)
+        for _ in range(int(whole)):
+            wav.writeframes(minute)
+        wav.writeframes(minute[:int(len(minute) * rest) // 2 * 2])
+    return path
+
+
+def start_fake_server(args):
+    command = [sys.executable, os.path.join(BENCH_DIR, "fake_groq_server.py"), "--port", "0",
+               "--latency", str(args.latency), "--jitter", "0"]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if "GROQ_BASE_URL=" not in line:
+        process.kill()
+        raise RuntimeError(f"Fake server did not start: {line!r}")
+    return process, line.strip().split("GROQ_BASE_URL=")[1]
+
+
+def run_one(args):
+    """Child process: one file in one mode, result printed as JSON on the last line"""
+    import tracemalloc
+
+    from backends import get_backend
+    from transcription_engine import transcribe_long_audio
+
+    backend = get_backend("groq")
+    baseline_rss, _ = rss_mb()
+    tracemalloc.start()
+    started = time.perf_counter()
+    transcript = transcribe_long_audio(args.fixture, backend, max_workers=args.workers,
+                                       max_segment_seconds=args.segment_seconds)
+    wall = time.perf_counter() - started
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    _, peak_rss = rss_mb()
+    print(json.dumps({
+        "wall_seconds": wall,
+        "audio_seconds": transcript.duration,
+        "traced_peak_mb": traced_peak / (1024 * 1024),
+        "rss_growth_mb": peak_rss - baseline_rss,
+    }))
+
+
+def run_config(args, fixture, mode, base_url):
+    command = [sys.executable, os.path.abspath(__file__), "--run-one", "--fixture", fixture,
+               "--workers", str(args.workers), "--segment-seconds", str(args.segment_seconds)]
+    env = dict(os.environ, GROQ_API_KEY=os.getenv("GROQ_API_KEY") or "benchmark", GROQ_BASE_URL=base_url,
+               UPLOAD_FORMAT=args.format, GROQ_REQUESTS_PER_MINUTE="100000", GROQ_AUDIO_SECONDS_PER_HOUR="1e9",
+               **MODES[mode])
+    completed = subprocess.run(command, env=env, capture_output=True, text=True, cwd=ROOT)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark run failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[10, 30, 90], help="Fixture audio lengths")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--segment-seconds", type=int, default=600, help="Max seconds per uploaded segment")
+    parser.add_argument("--format", default="wav", help="Upload format (ogg needs ffmpeg; wav does not)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake server seconds per call")
+    parser.add_argument("--max-growth", type=float, help="Allowed spooled peak growth, smallest to largest file")
+    # Internal: a single run, in a child process
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--fixture", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        return run_one(args)
+
+    fixtures = tempfile.mkdtemp(prefix="bench_fixtures_")
+    server, base_url = start_fake_server(args)
+    results = {}
+    print(f"{'minutes':>7} {'file MB':>8} {'mode':<10} {'traced MB':>10} {'RSS +MB':>8} {'wall s':>7}")
+    try:
+        for minutes in sorted(args.minutes):
+            fixture = write_fixture(fixtures, minutes)
+            size_mb = os.path.getsize(fixture) / (1024 * 1024)
+            for mode in args.modes:
+                result = results[(minutes, mode)] = run_config(args, fixture, mode, base_url)
+                print(f"{minutes:>7g} {size_mb:>8.1f} {mode:<10} {result['traced_peak_mb']:>10.1f} "
+                      f"{result['rss_growth_mb']:>8.1f} {result['wall_seconds']:>7.1f}")
+    finally:
+        server.kill()
+        shutil.rmtree(fixtures, ignore_errors=True)
+
+    spooled = [results[(minutes, "spooled")] for minutes in sorted(args.minutes) if (minutes, "spooled") in results]
+    if args.max_growth is not None and len(spooled) > 1:
+        smallest, largest = spooled[0]["traced_peak_mb"], spooled[-1]["traced_peak_mb"]
+        if largest > smallest * (1 + args.max_growth):
+            print(f"Spooled peak grew from {smallest:.1f} MB to {largest:.1f} MB")
+            sys.exit(1)
+        print(f"Spooled peak stayed within {args.max_growth:.0%}: {smallest:.1f} MB -> {largest:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
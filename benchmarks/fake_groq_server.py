@@ -0,0 +1,179 @@
+"""Local stand-in for the Groq transcription endpoint.
+
+Accepts the same multipart uploads as /openai/v1/audio/transcriptions and
+answers with verbose_json, after a simulated delay of
+
+    latency + upload_mb * seconds_per_mb + audio_seconds * realtime_factor
+
+(with seeded log-normal jitter). It can also enforce a requests-per-minute
+quota (429 with Retry-After), fail a fraction of calls with 503, and stall a
+fraction of calls for extra seconds, so the scheduler's pacing and retries
+and the straggler hedging get exercised. Point the app at it with
+GROQ_BASE_URL=http://127.0.0.1:<port>.
+
+Run with: python benchmarks/fake_groq_server.py --port 8765 --latency 0.2 --rpm 60
+"""
+import argparse
+import collections
+import json
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Without a WAV header, assume ~32 kbps Opus to estimate the audio length
+ASSUMED_BYTES_PER_SECOND = 4000
+
+
+def wav_seconds(data):
+    """Duration of a RIFF/WAVE payload found anywhere in data, or None"""
+    start = data.find(b"RIFF")
+    if start < 0 or data[start + 8:start + 12] != b"WAVE":
+        return None
+    position = start + 12
+    byte_rate = None
+    while position + 8 <= len(data):
+        chunk_id, size = data[position:position + 4], struct.unpack("<I", data[position + 4:position + 8])[0]
+        if chunk_id == b"fmt ":
+            byte_rate = struct.unpack("<I", data[position + 16:position + 20])[0]
+        elif chunk_id == b"data" and byte_rate:
+            return min(size, len(data) - position - 8) / byte_rate
+        position += 8 + size + (size & 1)
+    return None
+
+
+class FakeGroq:
+    def __init__(self, latency=0.2, seconds_per_mb=0.0, realtime_factor=0.0, jitter=0.2, rpm=0,
+                 error_rate=0.0, straggler_rate=0.0, straggler_seconds=5.0, seed=0):
+        self.latency = latency
+        self.seconds_per_mb = seconds_per_mb
+        self.realtime_factor = realtime_factor
+        self.jitter = jitter
+        self.rpm = rpm
+        self.error_rate = error_rate
+        self.straggler_rate = straggler_rate
+        self.straggler_seconds = straggler_seconds
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent = collections.deque()
+        self.stats = {"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0, "stragglers": 0, "bytes": 0}
+
+    def admit(self):
+        """(status, retry_after) for one incoming request"""
+        with self._lock:
+            self.stats["requests"] += 1
+            now = time.monotonic()
+            if self.rpm:
+                while self._recent and now - self._recent[0] >= 60.0:
+                    self._recent.popleft()
+                if len(self._recent) >= self.rpm:
+                    self.stats["rate_limited"] += 1
+                    return 429, 60.0 - (now - self._recent[0])
+                self._recent.append(now)
+            if self._random.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return 503, None
+            return 200, None
+
+    def delay(self, size, audio_seconds):
+        with self._lock:
+            noise = self._random.lognormvariate(0.0, self.jitter) if self.jitter else 1.0
+            # A stalled backend node: same work, a long extra wait
+            stall = self.straggler_seconds if self._random.random() < self.straggler_rate else 0.0
+            if stall:
+                self.stats["stragglers"] += 1
+        work = self.latency + size / 1e6 * self.seconds_per_mb + audio_seconds * self.realtime_factor
+        return work * noise + stall
+
+    def transcribe(self, body):
+        audio_seconds = wav_seconds(body) or len(body) / ASSUMED_BYTES_PER_SECOND
+        with self._lock:
+            self.stats["ok"] += 1
+            self.stats["bytes"] += len(body)
+        # One segment per 5 s of audio, so timestamps and chunking have something to work on
+        segments = []
+        start = 0.0
+        while start < audio_seconds:
+            end = min(audio_seconds, start + 5.0)
+            segments.append({"id": len(segments), "start": start, "end": end,
+                             "text": f"words from {start:.0f} to {end:.0f}"})
+            start = end
+        return {"text": " ".join(segment["text"] for segment in segments), "language": "en",
+                "duration": audio_seconds, "segments": segments}
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if not self.path.endswith("/audio/transcriptions"):
+                return self.reply(404, {"error": {"message": "not found"}})
+            status, retry_after = fake.admit()
+            if status == 429:
+                return self.reply(429, {"error": {"message": "rate limited"}},
+                                  {"retry-after": f"{retry_after:.2f}"})
+            if status != 200:
+                return self.reply(status, {"error": {"message": "simulated failure"}})
+            result = fake.transcribe(body)
+            time.sleep(fake.delay(len(body), result["duration"]))
+            self.reply(200, result)
+
+        def do_GET(self):
+            # Server-side counters, for the benchmark runner
+            self.reply(200, fake.stats)
+
+        def reply(self, status, payload, headers=None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_server(port=0, **options):
+    """Serve a FakeGroq on a background thread; returns (server, fake, base_url)"""
+    fake = FakeGroq(**options)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, fake, f"http://127.0.0.1:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Fixed seconds per call")
+    parser.add_argument("--seconds-per-mb", type=float, default=0.0, help="Extra seconds per uploaded MB")
+    parser.add_argument("--realtime-factor", type=float, default=0.0, help="Extra seconds per audio second")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Sigma of the log-normal latency noise")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute before 429s (0: unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls failing with 503")
+    parser.add_argument("--straggler-rate", type=float, default=0.0, help="Fraction of calls that stall")
+    parser.add_argument("--straggler-seconds", type=float, default=5.0, help="Extra seconds for a stalled call")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server, _, base_url = start_server(args.port, latency=args.latency, seconds_per_mb=args.seconds_per_mb,
+                                       realtime_factor=args.realtime_factor, jitter=args.jitter, rpm=args.rpm,
+                                       error_rate=args.error_rate, straggler_rate=args.straggler_rate,
+                                       straggler_seconds=args.straggler_seconds, seed=args.seed)
+    print(f"Fake Groq listening; export GROQ_BASE_URL={base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
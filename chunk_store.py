@@ -0,0 +1,113 @@
+import json
+import os
+import struct
+import tempfile
+from array import array
+
+from chunker import write_chunk_files
+
+# chunks.jsonl holds one JSON chunk per line; chunks.idx holds a small header
+# followed by the byte offset of every line, so chunk N is one seek away.
+DATA_NAME = "chunks.jsonl"
+INDEX_NAME = "chunks.idx"
+INDEX_MAGIC = b"CHKIDX1\0"
+INDEX_HEADER = struct.Struct("<8sQQ")  # magic, chunk count, data file size
+
+# Also write the old chunk_N.txt files (for tools that still read them)
+LEGACY_CHUNK_FILES = os.getenv("LEGACY_CHUNK_FILES", "0") == "1"
+
+
+def _atomic_write(path, payload):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_chunk_store(chunks, output_dir, legacy=LEGACY_CHUNK_FILES):
+    """Write all chunks to one JSONL file plus an offset index; returns the data path.
+
+    Both files are replaced atomically, data first; the index records the data
+    size it describes, so a reader never pairs a new index with old data.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    lines = [json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n" for chunk in chunks]
+
+    offsets = array("Q")
+    position = 0
+    for line in lines:
+        offsets.append(position)
+        position += len(line)
+    # The index is always little-endian on disk
+    if not _little_endian():
+        offsets.byteswap()
+
+    data_path = os.path.join(output_dir, DATA_NAME)
+    _atomic_write(data_path, b"".join(lines))
+    _atomic_write(os.path.join(output_dir, INDEX_NAME),
+                  INDEX_HEADER.pack(INDEX_MAGIC, len(lines), position) + offsets.tobytes())
+
+    if legacy:
+        write_chunk_files(chunks, output_dir)
+    return data_path
+
+
+def _little_endian():
+    return array("H", [1]).tobytes() == b"\x01\x00"
+
+
+class ChunkReader:
+    """Random access to a chunk store without reading the whole file"""
+
+    def __init__(self, output_dir):
+        self.data_path = os.path.join(output_dir, DATA_NAME)
+        with open(os.path.join(output_dir, INDEX_NAME), "rb") as f:
+            magic, count, data_size = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+            if magic != INDEX_MAGIC:
+                raise ValueError(f"Not a chunk index: {output_dir}")
+            self.offsets = array("Q")
+            self.offsets.frombytes(f.read(count * 8))
+        if not _little_endian():
+            self.offsets.byteswap()
+        if len(self.offsets) != count or os.path.getsize(self.data_path) != data_size:
+            raise ValueError(f"Chunk index does not match data in {output_dir}")
+        self._file = open(self.data_path, "rb")
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def get(self, index):
+        if not 0 <= index < len(self.offsets):
+            raise IndexError(index)
+        self._file.seek(self.offsets[index])
+        return json.loads(self._file.readline())
+
+    def __getitem__(self, index):
+        return self.get(index)
+
+    def __iter__(self):
+        self._file.seek(0)
+        for line in self._file:
+            yield json.loads(line)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def export_chunk_files(output_dir, target_dir=None):
+    """Legacy exporter: write chunk_N.txt files from an existing store"""
+    with ChunkReader(output_dir) as reader:
+        return write_chunk_files(list(reader), target_dir or output_dir)
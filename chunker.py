@@ -0,0 +1,101 @@
+import json
+import os
+
+# Length of the time windows transcripts are grouped into
+CHUNK_SECONDS = 30
+
+
+def chunk_transcript(segments, words=None, window_seconds=CHUNK_SECONDS):
+    """Bucket timestamped words (or segments) into fixed time windows in one pass.
+
+    Items must be in timeline order, as the transcription engine returns them.
+    Each chunk is {"index", "start", "end", "text"} with real media times.
+    """
+    items = words or segments or []
+    chunks = []
+    current = None
+    for item in items:
+        text = (item.get("word") or item.get("text") or "").strip()
+        if not text:
+            continue
+        start = float(item.get("start", 0.0))
+        end = float(item.get("end", start))
+        window = int(start // window_seconds)
+        if current is None or window != current["window"]:
+            current = {"window": window, "start": start, "end": end, "parts": []}
+            chunks.append(current)
+        current["parts"].append(text)
+        current["end"] = max(current["end"], end)
+
+    return [
+        {"index": index, "start": chunk["start"], "end": chunk["end"], "text": " ".join(chunk["parts"])}
+        for index, chunk in enumerate(chunks)
+    ]
+
+
+def format_timestamp(seconds, separator=","):
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600 * 1000)
+    minutes, milliseconds = divmod(milliseconds, 60 * 1000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
+
+
+def format_label(seconds):
+    """Short mm:ss (or h:mm:ss) label for display"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def to_srt(chunks):
+    blocks = []
+    for chunk in chunks:
+        blocks.append(
+            f"{chunk['index'] + 1}\n"
+            f"{format_timestamp(chunk['start'])} --> {format_timestamp(chunk['end'])}\n"
+            f"{chunk['text']}\n"
+        )
+    return "\n".join(blocks)
+
+
+def to_vtt(chunks):
+    blocks = ["WEBVTT\n"]
+    for chunk in chunks:
+        blocks.append(
+            f"{format_timestamp(chunk['start'], '.')} --> {format_timestamp(chunk['end'], '.')}\n"
+            f"{chunk['text']}\n"
+        )
+    return "\n".join(blocks)
+
+
+def to_json(chunks):
+    return json.dumps(chunks, ensure_ascii=False, indent=2)
+
+
+SUBTITLE_FORMATS = {
+    "srt": to_srt,
+    "vtt": to_vtt,
+    "json": to_json,
+}
+
+
+def write_chunk_files(chunks, output_dir):
+    """Write each chunk to chunk_N.txt, returning how many were written"""
+    os.makedirs(output_dir, exist_ok=True)
+    for chunk in chunks:
+        chunk_filename = os.path.join(output_dir, f"chunk_{chunk['index'] + 1}.txt")
+        with open(chunk_filename, "w", encoding="utf-8") as f:
+            f.write(chunk["text"])
+    return len(chunks)
+
+
+def write_subtitles(chunks, output_dir, name="transcript"):
+    """Write SRT, VTT and JSON versions of the chunks, returning their paths"""
+    paths = {}
+    for extension, render in SUBTITLE_FORMATS.items():
+        path = os.path.join(output_dir, f"{name}.{extension}")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(render(chunks))
+        paths[extension] = path
+    return paths
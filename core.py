@@ -0,0 +1,161 @@
+"""Shared configuration and lazily-built clients/models.
+
+Nothing heavy is imported or constructed until first use, so importing this
+module (and the scripts built on it) stays cheap. Every getter is thread-safe
+and returns the same instance on each call.
+"""
+import importlib
+import os
+import threading
+
+_lock = threading.RLock()
+_instances = {}
+_env_loaded = False
+
+# HTTP connection pool shared by every transcription call in the process
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", 20))
+GROQ_MAX_KEEPALIVE = int(os.getenv("GROQ_MAX_KEEPALIVE", 10))
+GROQ_TIMEOUT_SECONDS = float(os.getenv("GROQ_TIMEOUT_SECONDS", 600))
+
+DEMUCS_MODEL = os.getenv("DEMUCS_MODEL", "htdemucs")
+
+# Local CPU Whisper (faster-whisper, int8-quantised); optional dependency
+LOCAL_WHISPER_MODEL = os.getenv("LOCAL_WHISPER_MODEL", "small")
+LOCAL_COMPUTE_TYPE = os.getenv("LOCAL_COMPUTE_TYPE", "int8")
+
+
+def load_env():
+    """Load the .env file once per process"""
+    global _env_loaded
+    with _lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            _env_loaded = True
+
+
+def get_setting(name, default=None):
+    load_env()
+    return os.getenv(name, default)
+
+
+def get_api_key():
+    api_key = get_setting("GROQ_API_KEY")
+    # Ensure the API key is available
+    if not api_key:
+        raise ValueError("GROQ_API_KEY is not set in the .env file!")
+    return api_key
+
+
+def _lazy(name, build):
+    instance = _instances.get(name)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = build()
+                _instances[name] = instance
+    return instance
+
+
+def _build_client():
+    import httpx
+    from groq import Groq
+    from metrics import http_timing_hooks
+
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_connections=GROQ_MAX_CONNECTIONS,
+                            max_keepalive_connections=GROQ_MAX_KEEPALIVE),
+        timeout=GROQ_TIMEOUT_SECONDS,
+        # Splits every transcription call into upload and model time for /metrics
+        event_hooks=http_timing_hooks(),
+    )
+    # GROQ_BASE_URL lets benchmarks point the client at a local stand-in server
+    # Retries are handled by the rate-limit-aware scheduler, not by the SDK
+    return Groq(api_key=get_api_key(), base_url=get_setting("GROQ_BASE_URL"), http_client=http_client,
+                max_retries=0)
+
+
+def get_client():
+    """Process-wide Groq client with a pooled, keep-alive HTTP connection"""
+    return _lazy("groq_client", _build_client)
+
+
+def get_scheduler():
+    """Process-wide quota scheduler shared by every transcription call"""
+    from rate_limiter import TranscriptionScheduler
+
+    return _lazy("scheduler", TranscriptionScheduler)
+
+
+def get_transcriber(priority=None, **kwargs):
+    """Groq transcribe callable paced and retried by the shared scheduler.
+
+    kwargs are passed to make_groq_transcriber (prompt, language, ...).
+    """
+    from rate_limiter import INTERACTIVE, scheduled
+    from transcription_engine import make_groq_transcriber
+
+    priority = INTERACTIVE if priority is None else priority
+    return scheduled(make_groq_transcriber(get_client(), **kwargs), get_scheduler(), priority=priority)
+
+
+def get_demucs_model(name=DEMUCS_MODEL):
+    def build():
+        from demucs import pretrained
+
+        print(f"Loading Demucs model: {name}")
+        model = pretrained.get_model(name)
+        model.eval()
+        return model
+    return _lazy(f"demucs:{name}", build)
+
+
+def get_separation_pool(name=DEMUCS_MODEL, workers=1, threads=1):
+    """Worker processes that each keep a warm Demucs model, shared by every separation in this process"""
+    def build():
+        from concurrent.futures import ProcessPoolExecutor
+        from vocal_separation import _init_worker
+
+        print(f"Starting {workers} separation workers for {name}")
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(name, threads))
+    return _lazy(f"separation_pool:{name}:{workers}:{threads}", build)
+
+
+def get_local_whisper_model(name=LOCAL_WHISPER_MODEL, compute_type=LOCAL_COMPUTE_TYPE):
+    def build():
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise RuntimeError("The local backend needs faster-whisper: pip install faster-whisper") from e
+
+        print(f"Loading local Whisper model: {name} ({compute_type})")
+        return WhisperModel(name, device="cpu", compute_type=compute_type)
+    return _lazy(f"whisper:{name}:{compute_type}", build)
+
+
+def get_yt_dlp():
+    return _lazy("yt_dlp", lambda: importlib.import_module("yt_dlp"))
+
+
+def get_media_resolver():
+    """Process-wide yt-dlp metadata resolver with its on-disk info cache"""
+    def build():
+        from media_resolver import MediaResolver
+
+        return MediaResolver()
+    return _lazy("media_resolver", build)
+
+
+def get_search_index():
+    """Process-wide full-text index of finished transcripts"""
+    def build():
+        from search_index import SearchIndex
+
+        return SearchIndex()
+    return _lazy("search_index", build)
+
+
+def get_sanscript():
+    return _lazy("sanscript", lambda: importlib.import_module("indic_transliteration.sanscript"))
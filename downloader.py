@@ -0,0 +1,40 @@
+import glob
+import os
+
+from core import get_media_resolver
+from metrics import metrics
+
+
+def downloaded_path(info, output_folder):
+    """Path of the file yt-dlp actually wrote, whatever extension it picked"""
+    for download in (info or {}).get("requested_downloads") or []:
+        if download.get("filepath") and os.path.exists(download["filepath"]):
+            return download["filepath"]
+    if info and info.get("filepath") and os.path.exists(info["filepath"]):
+        return info["filepath"]
+    # Fall back to whatever audio.* landed in the folder
+    matches = [path for path in glob.glob(os.path.join(output_folder, "audio.*"))
+               if not path.endswith((".part", ".ytdl"))]
+    return matches[0] if matches else None
+
+
+# Function to download YouTube video and extract audio
+def download_audio_from_youtube(url, output_folder, progress_hook=None):
+    print(f"Downloading audio from URL: {url}")
+    os.makedirs(output_folder, exist_ok=True)
+
+    # Metadata comes from the resolver's cache; only the smallest adequate audio-only format is fetched
+    info = None
+    try:
+        with metrics.span("download"):
+            info = get_media_resolver().download_audio(url, output_folder, progress_hook=progress_hook)
+        print("Download completed. Audio extracted.")
+    except Exception as e:
+        print(f"Error downloading audio: {e}")
+
+    audio_path = downloaded_path(info, output_folder)
+    if not audio_path:
+        print(f"Audio file not found in: {output_folder}")
+        return None
+    metrics.count("pipeline_bytes_total", os.path.getsize(audio_path), direction="downloaded")
+    return audio_path
@@ -0,0 +1,170 @@
+import bisect
+import collections
+import math
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from metrics import metrics
+from rate_limiter import CANCEL_POLL_SECONDS
+
+# Send a duplicate for any call still running past this percentile of similar calls
+HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "1") == "1"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", 0.95))
+# No hedging for a size bucket until it has seen this many calls
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", 20))
+# At most this fraction of calls is duplicated, so a slow backend is not swamped
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", 0.1))
+HEDGE_WINDOW = 500
+HEDGE_POOL_WORKERS = int(os.getenv("HEDGE_POOL_WORKERS", 64))
+
+# Upper bounds (seconds of uploaded audio): calls are only compared with calls of similar size
+SIZE_BUCKETS = (15, 30, 60, 120, 300, 600)
+
+
+def size_bucket(audio_seconds):
+    position = bisect.bisect_left(SIZE_BUCKETS, audio_seconds or 0.0)
+    return SIZE_BUCKETS[position] if position < len(SIZE_BUCKETS) else math.inf
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty sequence"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+class LatencyTracker:
+    """Recent call latencies per (backend, size bucket), plus the process-wide hedge budget"""
+
+    def __init__(self, window=HEDGE_WINDOW, min_samples=HEDGE_MIN_SAMPLES):
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self.stats = {"calls": 0, "hedges": 0}
+
+    def observe(self, backend, audio_seconds, seconds):
+        key = (backend, size_bucket(audio_seconds))
+        with self._lock:
+            if key not in self._latencies:
+                self._latencies[key] = collections.deque(maxlen=self.window)
+            self._latencies[key].append(seconds)
+
+    def threshold(self, backend, audio_seconds, fraction=HEDGE_PERCENTILE):
+        """Straggler cut-off for a call of this size, or None while there are too few samples"""
+        with self._lock:
+            latencies = list(self._latencies.get((backend, size_bucket(audio_seconds))) or ())
+        if len(latencies) < self.min_samples:
+            return None
+        return percentile(latencies, fraction)
+
+    def count_call(self):
+        with self._lock:
+            self.stats["calls"] += 1
+
+    def take_hedge(self, budget=HEDGE_BUDGET):
+        """Reserve one hedge if the budget allows it"""
+        with self._lock:
+            if self.stats["hedges"] + 1 > max(1.0, budget * self.stats["calls"]):
+                return False
+            self.stats["hedges"] += 1
+            return True
+
+    def summary(self):
+        with self._lock:
+            items = [(key, list(latencies)) for key, latencies in self._latencies.items()]
+        return {f"{backend}:{bucket}": {"count": len(latencies), "p50": percentile(latencies, 0.5),
+                                        "p95": percentile(latencies, 0.95), "p99": percentile(latencies, 0.99)}
+                for (backend, bucket), latencies in sorted(items, key=lambda item: (item[0][0], item[0][1]))
+                if latencies}
+
+
+# Shared by every job in the process, so thresholds stay warm between jobs
+latency_tracker = LatencyTracker()
+# Attempts run here while the segment worker waits on them
+_attempts = ThreadPoolExecutor(max_workers=HEDGE_POOL_WORKERS, thread_name_prefix="attempt")
+
+
+class AnyCancel:
+    """Cancel token that is set once any of its parts is (the job's deadline, or this attempt losing)"""
+
+    def __init__(self, *events):
+        self.events = [event for event in events if event is not None]
+
+    def is_set(self):
+        return any(event.is_set() for event in self.events)
+
+    def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+        while not self.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(remaining, CANCEL_POLL_SECONDS))
+        return True
+
+
+class HedgedTranscriber:
+    """transcribe(filename, data, **options) that duplicates calls running past the p95 of their size.
+
+    Whichever attempt returns first wins and the other is cancelled: it stops
+    waiting for quota or retrying, and a request already on the wire has its
+    result dropped when it lands.
+    """
+
+    def __init__(self, transcribe_fn, tracker=latency_tracker, fraction=HEDGE_PERCENTILE, budget=HEDGE_BUDGET,
+                 pool=_attempts):
+        self.transcribe_fn = transcribe_fn
+        self.name = getattr(transcribe_fn, "name", None) or getattr(transcribe_fn, "__name__", "transcribe")
+        self.model = getattr(transcribe_fn, "model", None)
+        self.tracker = tracker
+        self.fraction = fraction
+        self.budget = budget
+        self.pool = pool
+
+    def saturated(self):
+        saturated = getattr(self.transcribe_fn, "saturated", None)
+        return bool(saturated and saturated())
+
+    def _attempt(self, filename, data, options, cancel):
+        started = time.perf_counter()
+        result = self.transcribe_fn(filename, data, cancel=cancel, **options)
+        self.tracker.observe(self.name, options.get("duration"), time.perf_counter() - started)
+        return result
+
+    def __call__(self, filename, data, **options):
+        job_cancel = options.pop("cancel", None)
+        self.tracker.count_call()
+        threshold = self.tracker.threshold(self.name, options.get("duration"), self.fraction)
+        primary_cancel = threading.Event()
+        primary = self.pool.submit(self._attempt, filename, data, options, AnyCancel(job_cancel, primary_cancel))
+        if threshold is None:
+            return primary.result()
+        done, _ = wait([primary], timeout=threshold)
+        if done or (job_cancel is not None and job_cancel.is_set()) or self.saturated() \
+                or not self.tracker.take_hedge(self.budget):
+            return primary.result()
+
+        hedge_cancel = threading.Event()
+        hedge = self.pool.submit(self._attempt, filename, data, options, AnyCancel(job_cancel, hedge_cancel))
+        metrics.count("pipeline_hedges_total", outcome="sent")
+        cancels = {primary: primary_cancel, hedge: hedge_cancel}
+        pending = set(cancels)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        cancels[loser].set()
+                        loser.cancel()
+                    metrics.count("pipeline_hedges_total", outcome="hedge_won" if future is hedge else "primary_won")
+                    return future.result()
+        # Both attempts failed: report the original call's error
+        return primary.result()
+
+
+def hedged(transcribe_fn):
+    if isinstance(transcribe_fn, HedgedTranscriber):
+        return transcribe_fn
+    return HedgedTranscriber(transcribe_fn)
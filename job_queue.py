@@ -0,0 +1,132 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+JOBS_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs.sqlite3")
+# Number of jobs processed at the same time
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """SQLite-backed job queue drained by a local worker pool.
+
+    Jobs are persisted before submit() returns, so they outlive the request that
+    created them; jobs interrupted by a restart are picked up again on startup.
+    handler(job_id, payload) returns a JSON-serialisable result or raises.
+    """
+
+    def __init__(self, handler, db_path=JOBS_DB, workers=JOB_WORKERS):
+        self.handler = handler
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL);
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+        """)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._recover()
+
+    def _execute(self, sql, args=()):
+        """Run a write and commit it; returns the number of rows changed"""
+        with self._lock:
+            cursor = self._db.execute(sql, args)
+            self._db.commit()
+            return cursor.rowcount
+
+    def _query(self, sql, args=(), one=False):
+        # Rows are fetched while the lock is held: the connection is shared by every thread
+        with self._lock:
+            cursor = self._db.execute(sql, args)
+            return cursor.fetchone() if one else cursor.fetchall()
+
+    def _recover(self):
+        # Jobs that were running when the process died start over
+        self._execute("UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?", (QUEUED, RUNNING))
+        rows = self._query("SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,))
+        for (job_id,) in rows:
+            self._executor.submit(self._run, job_id)
+        if rows:
+            print(f"Resumed {len(rows)} queued jobs")
+
+    def submit(self, payload):
+        job_id = uuid.uuid4().hex
+        self._execute(
+            "INSERT INTO jobs (id, status, payload, created_at) VALUES (?, ?, ?, ?)",
+            (job_id, QUEUED, json.dumps(payload), time.time()))
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def _run(self, job_id):
+        # Claim the job atomically so it never runs twice
+        claimed = self._execute(
+            "UPDATE jobs SET status = ?, started_at = ? WHERE id = ? AND status = ?",
+            (RUNNING, time.time(), job_id, QUEUED))
+        if not claimed:
+            return
+        payload = json.loads(self._query("SELECT payload FROM jobs WHERE id = ?", (job_id,), one=True)[0])
+        try:
+            result = self.handler(job_id, payload)
+        except Exception as e:
+            traceback.print_exc()
+            self._execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (FAILED, str(e), time.time(), job_id))
+            return
+        self._execute(
+            "UPDATE jobs SET status = ?, result = ?, finished_at = ? WHERE id = ?",
+            (DONE, json.dumps(result), time.time(), job_id))
+
+    def get(self, job_id):
+        row = self._query(
+            "SELECT id, status, payload, result, error, created_at, started_at, finished_at "
+            "FROM jobs WHERE id = ?", (job_id,), one=True)
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "status": row[1],
+            "payload": json.loads(row[2]),
+            "result": json.loads(row[3]) if row[3] else None,
+            "error": row[4],
+            "created_at": row[5],
+            "started_at": row[6],
+            "finished_at": row[7],
+        }
+
+    def status(self, job_id):
+        """Job info without the (potentially large) result, which is never read from the database"""
+        row = self._query(
+            "SELECT id, status, payload, error, created_at, started_at, finished_at "
+            "FROM jobs WHERE id = ?", (job_id,), one=True)
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "status": row[1],
+            "payload": json.loads(row[2]),
+            "error": row[3],
+            "created_at": row[4],
+            "started_at": row[5],
+            "finished_at": row[6],
+        }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,115 @@
+import os
+import threading
+
+from audio_preprocess import encode
+from spool import open_payload
+from transliteration import contains_tamil
+
+# Detect the language once per job on a short clip, then pin it for every segment
+LANGUAGE_ROUTING = os.getenv("LANGUAGE_ROUTING", "1") == "1"
+# Set to skip the probe and pin this ISO-639-1 code directly
+TRANSCRIPTION_LANGUAGE = os.getenv("TRANSCRIPTION_LANGUAGE") or None
+PROBE_SECONDS = float(os.getenv("LANGUAGE_PROBE_SECONDS", 20))
+# Whisper reads at most ~224 prompt tokens; the end of the previous text is what matters
+PROMPT_TAIL_CHARS = 200
+
+# Whisper reports language names in verbose_json; the API takes ISO-639-1 codes
+LANGUAGE_CODES = {
+    "english": "en", "tamil": "ta", "hindi": "hi", "telugu": "te", "kannada": "kn", "malayalam": "ml",
+    "bengali": "bn", "marathi": "mr", "gujarati": "gu", "punjabi": "pa", "urdu": "ur", "sinhala": "si",
+    "nepali": "ne", "arabic": "ar", "chinese": "zh", "japanese": "ja", "korean": "ko", "french": "fr",
+    "german": "de", "spanish": "es", "portuguese": "pt", "italian": "it", "russian": "ru", "indonesian": "id",
+    "malay": "ms", "thai": "th", "vietnamese": "vi", "turkish": "tr", "dutch": "nl",
+}
+
+
+def language_code(language):
+    """ISO-639-1 code for a Whisper language name or code, or None if unknown"""
+    if not language:
+        return None
+    language = str(language).strip().lower()
+    if len(language) == 2:
+        return language
+    return LANGUAGE_CODES.get(language)
+
+
+def prompt_tail(text, limit=PROMPT_TAIL_CHARS):
+    """Last words of text, at most limit characters, cut on a word boundary"""
+    text = " ".join((text or "").split())
+    if len(text) <= limit:
+        return text
+    tail = text[-limit:]
+    return tail.split(" ", 1)[1] if " " in tail else tail
+
+
+def probe_clip(segment, seconds=PROBE_SECONDS):
+    """Encoded first seconds of a segment's upload (already speech-only when VAD packed it)"""
+    from pydub import AudioSegment
+
+    if segment.audio_seconds() <= seconds:
+        return segment.data
+    upload_format = os.path.splitext(segment.filename)[1].lstrip(".")
+    with open_payload(segment.data) as f:
+        audio = AudioSegment.from_file(f, format=upload_format, duration=seconds)
+    return encode(audio[:int(seconds * 1000)], format=upload_format)
+
+
+class LanguageRouter:
+    """Per-job routing: language detected once on a probe clip, then pinned.
+
+    Every segment after the first is prompted with the tail of the nearest
+    earlier segment already transcribed (segments run concurrently, so that is
+    not always the immediately preceding one). The probe also settles whether
+    the transcript needs a Tanglish transliteration pass.
+    """
+
+    def __init__(self, language=TRANSCRIPTION_LANGUAGE, prompt=None, probe_seconds=PROBE_SECONDS):
+        self.language = language_code(language)
+        self.prompt = prompt
+        self.probe_seconds = probe_seconds
+        # Pinned by configuration: nothing to probe, transliterate only for Tamil
+        self.decided = self.language is not None
+        self.transliterate = self.language == "ta" if self.decided else None
+        self._lock = threading.Lock()
+        self._texts = {}
+
+    def detect(self, segment, transcribe_fn, cancel=None):
+        """Probe the segment once and pin the language; a failed (or cancelled) probe leaves it to the model"""
+        from transcription_engine import response_field
+
+        if self.decided:
+            return self.language
+        self.decided = True
+        try:
+            clip = probe_clip(segment, self.probe_seconds)
+            options = {"cancel": cancel} if cancel is not None else {}
+            response = transcribe_fn(f"probe_{segment.filename}", clip,
+                                     duration=min(self.probe_seconds, segment.audio_seconds()), **options)
+        except Exception as e:
+            print(f"Language probe failed, leaving detection to the model: {e}")
+            return None
+        text = response_field(response, "text") or ""
+        detected = response_field(response, "language")
+        self.language = language_code(detected)
+        self.transliterate = self.language == "ta" or contains_tamil(text)
+        print(f"Language probe: {detected or 'unknown'} -> pinned {self.language or 'none'}, "
+              f"transliteration {'needed' if self.transliterate else 'skipped'}")
+        return self.language
+
+    def options_for(self, segment):
+        """Per-call transcription options for a segment: pinned language and context prompt"""
+        options = {}
+        if self.language:
+            options["language"] = self.language
+        with self._lock:
+            earlier = [index for index in self._texts if index < segment.index]
+            previous = self._texts[max(earlier)] if earlier else None
+        prompt = prompt_tail(previous) if previous else self.prompt
+        if prompt:
+            options["prompt"] = prompt
+        return options
+
+    def record(self, result):
+        if result.text:
+            with self._lock:
+                self._texts[result.index] = result.text
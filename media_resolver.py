@@ -0,0 +1,209 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import parse_qs, urlparse
+
+from core import get_yt_dlp
+from transcript_cache import extract_video_id
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "media_info.sqlite3")
+# Metadata is reused this long; entries holding signed media URLs expire with them
+INFO_TTL_SECONDS = int(os.getenv("MEDIA_INFO_TTL_SECONDS", 60 * 60))
+PLAYLIST_TTL_SECONDS = int(os.getenv("PLAYLIST_TTL_SECONDS", 60 * 60))
+# Signed URLs are dropped this long before they stop working
+URL_EXPIRY_MARGIN_SECONDS = 5 * 60
+
+# Smallest audio-only format at or above this bitrate (kbps); Whisper needs little more
+MIN_AUDIO_BITRATE = float(os.getenv("MIN_AUDIO_BITRATE", 48))
+
+# ffmpeg is only needed by yt-dlp for some formats; use the configured binary if present
+FFMPEG_LOCATION = os.getenv(
+    "FFMPEG_LOCATION", "C:\\ProgramData\\chocolatey\\lib\\ffmpeg-full\\tools\\ffmpeg\\bin\\ffmpeg.exe")
+
+
+def audio_bitrate(fmt):
+    return fmt.get("abr") or fmt.get("tbr") or 0.0
+
+
+def estimated_size(fmt, duration):
+    return fmt.get("filesize") or fmt.get("filesize_approx") or audio_bitrate(fmt) * 125 * (duration or 0)
+
+
+def pick_audio_format(info, min_bitrate=MIN_AUDIO_BITRATE):
+    """Smallest audio-only format meeting the bitrate floor (the best one if none does), or None"""
+    formats = [fmt for fmt in info.get("formats") or []
+               if fmt.get("vcodec") in (None, "none") and fmt.get("acodec") not in (None, "none")
+               and fmt.get("url") and not fmt.get("has_drm")]
+    if not formats:
+        return None
+    eligible = [fmt for fmt in formats if audio_bitrate(fmt) >= min_bitrate]
+    if not eligible:
+        return max(formats, key=audio_bitrate)
+    duration = info.get("duration")
+    return min(eligible, key=lambda fmt: (estimated_size(fmt, duration), audio_bitrate(fmt)))
+
+
+def url_expiry(info):
+    """Earliest expiry (epoch seconds) of the signed media URLs in info, if they carry one"""
+    expiries = []
+    for fmt in info.get("formats") or []:
+        query = parse_qs(urlparse(fmt.get("url") or "").query)
+        if "expire" in query:
+            try:
+                expiries.append(float(query["expire"][0]))
+            except ValueError:
+                continue
+    return min(expiries) if expiries else None
+
+
+class MediaResolver:
+    """yt-dlp metadata lookups, cached on disk per video id and shared across threads.
+
+    Each worker thread keeps its own YoutubeDL instances, and concurrent lookups
+    of the same video wait for a single extraction instead of each running one.
+    """
+
+    def __init__(self, cache_path=CACHE_PATH, info_ttl=INFO_TTL_SECONDS, playlist_ttl=PLAYLIST_TTL_SECONDS,
+                 min_bitrate=MIN_AUDIO_BITRATE):
+        self.info_ttl = info_ttl
+        self.playlist_ttl = playlist_ttl
+        self.min_bitrate = min_bitrate
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        self._db = sqlite3.connect(cache_path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS media_info (
+                key TEXT PRIMARY KEY, data BLOB NOT NULL, expires_at REAL NOT NULL)""")
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._local = threading.local()
+        self.stats = {"hits": 0, "misses": 0, "downloads": 0}
+
+    # -- per-thread YoutubeDL --
+
+    def _ydl(self, kind):
+        instances = getattr(self._local, "instances", None)
+        if instances is None:
+            instances = self._local.instances = {}
+        if kind not in instances:
+            options = {"quiet": True, "no_warnings": True, "noplaylist": kind != "playlist",
+                       "postprocessors": []}
+            if kind == "playlist":
+                options["extract_flat"] = "in_playlist"
+            if FFMPEG_LOCATION and os.path.exists(FFMPEG_LOCATION):
+                options["ffmpeg_location"] = FFMPEG_LOCATION
+            ydl = get_yt_dlp().YoutubeDL(options)
+            # One permanent hook that forwards to whatever the current call on this thread asked for
+            ydl.add_progress_hook(self._dispatch_progress)
+            instances[kind] = ydl
+        return instances[kind]
+
+    def _dispatch_progress(self, status):
+        hook = getattr(self._local, "progress_hook", None)
+        if hook:
+            hook(status)
+
+    # -- cache --
+
+    def _load(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT data, expires_at FROM media_info WHERE key = ?", (key,)).fetchone()
+        if row and row[1] > time.time():
+            return json.loads(zlib.decompress(row[0]))
+        return None
+
+    def _store(self, key, data, ttl):
+        expires_at = time.time() + ttl
+        expiry = url_expiry(data) if isinstance(data, dict) else None
+        if expiry:
+            expires_at = min(expires_at, expiry - URL_EXPIRY_MARGIN_SECONDS)
+        payload = zlib.compress(json.dumps(data).encode("utf-8"))
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO media_info (key, data, expires_at) VALUES (?, ?, ?)",
+                             (key, payload, expires_at))
+            self._db.execute("DELETE FROM media_info WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+    def _cached(self, key, ttl, fetch):
+        data = self._load(key)
+        if data is not None:
+            self._count("hits")
+            return data
+        # Only one thread extracts a given key; the others wait and read its result
+        with self._lock:
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[key] = threading.Event()
+        if not owner:
+            pending.wait()
+            data = self._load(key)
+            if data is not None:
+                self._count("hits")
+                return data
+        try:
+            self._count("misses")
+            data = fetch()
+            self._store(key, data, ttl)
+            return data
+        finally:
+            if owner:
+                with self._lock:
+                    del self._pending[key]
+                pending.set()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    # -- lookups --
+
+    def resolve(self, url):
+        """Full yt-dlp info for a single video (JSON-safe, possibly from the cache)"""
+        key = f"video:{extract_video_id(url) or url}"
+
+        def fetch():
+            ydl = self._ydl("video")
+            return ydl.sanitize_info(ydl.extract_info(url, download=False))
+        return self._cached(key, self.info_ttl, fetch)
+
+    def expand_playlist(self, url):
+        """Flat playlist entries ({id, url, title, ...}) without resolving each video"""
+        def fetch():
+            ydl = self._ydl("playlist")
+            info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+            return [entry for entry in info.get("entries") or [] if entry]
+        return self._cached(f"playlist:{url}", self.playlist_ttl, fetch)
+
+    def audio_format(self, url):
+        """(format dict, info) for the audio-only format we would fetch"""
+        info = self.resolve(url)
+        return pick_audio_format(info, self.min_bitrate), info
+
+    def stream_source(self, url):
+        """Direct media URL and request headers of the chosen audio format"""
+        fmt, info = self.audio_format(url)
+        if fmt is None:
+            return info["url"], info.get("http_headers") or {}, info
+        return fmt["url"], fmt.get("http_headers") or info.get("http_headers") or {}, info
+
+    def download_audio(self, url, output_folder, progress_hook=None):
+        """Download the chosen audio format into output_folder; returns the info with the real file path"""
+        fmt, info = self.audio_format(url)
+        ydl = self._ydl("video")
+        # The selector is compiled when YoutubeDL is built, so swap the compiled one per call
+        ydl.format_selector = ydl.build_format_selector(fmt["format_id"] if fmt else "bestaudio/best")
+        ydl.params["outtmpl"]["default"] = os.path.join(output_folder, "audio.%(ext)s")
+        self._local.progress_hook = progress_hook
+        try:
+            # Re-uses the cached metadata: only the media itself is fetched
+            result = ydl.process_ie_result(dict(info), download=True)
+        finally:
+            self._local.progress_hook = None
+        self._count("downloads")
+        if fmt:
+            print(f"Downloaded format {fmt['format_id']} ({audio_bitrate(fmt):.0f} kbps, {fmt.get('ext')})")
+        return result
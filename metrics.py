@@ -0,0 +1,177 @@
+import bisect
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+# Pipeline stages, in the order a job goes through them
+STAGES = ("download", "preprocess", "upload", "transcribe", "postprocess", "write")
+# Histogram buckets (seconds) shared by every stage
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+COUNTERS = {
+    "pipeline_bytes_total": "Bytes moved by the pipeline, by direction",
+    "pipeline_audio_seconds_total": "Seconds of audio seen (source) and uploaded (sent)",
+    "pipeline_segments_total": "Transcription calls made, by backend",
+    "pipeline_hedges_total": "Duplicate calls sent for stragglers, and which attempt won",
+    "pipeline_missing_seconds_total": "Audio left untranscribed when a job hit its deadline",
+}
+
+
+class Metrics:
+    """Process-wide stage timings and counters.
+
+    Recording is a perf_counter pair and a dict update under one lock, cheap
+    enough to leave on; rendering happens only when /metrics is scraped.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = self._stages[stage] = {"count": 0, "sum": 0.0, "max": 0.0,
+                                               "buckets": [0] * len(self.buckets)}
+            entry["count"] += 1
+            entry["sum"] += seconds
+            entry["max"] = max(entry["max"], seconds)
+            position = bisect.bisect_left(self.buckets, seconds)
+            if position < len(self.buckets):
+                entry["buckets"][position] += 1
+
+    @contextmanager
+    def span(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def count(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def summary(self, since=None):
+        """{stage: {count, seconds, mean, max}} plus counters; since subtracts an earlier summary"""
+        with self._lock:
+            stages = {stage: {"count": entry["count"], "seconds": entry["sum"], "max": entry["max"]}
+                      for stage, entry in self._stages.items()}
+            counters = {f"{name}{format_labels(labels)}": value for (name, labels), value in self._counters.items()}
+        if since:
+            for stage, entry in stages.items():
+                before = since["stages"].get(stage, {"count": 0, "seconds": 0.0})
+                entry["count"] -= before["count"]
+                entry["seconds"] -= before["seconds"]
+            counters = {name: value - since["counters"].get(name, 0) for name, value in counters.items()}
+        for entry in stages.values():
+            entry["mean"] = entry["seconds"] / entry["count"] if entry["count"] else 0.0
+        return {"stages": stages, "counters": counters}
+
+    def render_prometheus(self, extra_gauges=None):
+        with self._lock:
+            stages = {stage: dict(entry, buckets=list(entry["buckets"])) for stage, entry in self._stages.items()}
+            counters = dict(self._counters)
+
+        lines = ["# HELP pipeline_stage_seconds Time spent in each pipeline stage",
+                 "# TYPE pipeline_stage_seconds histogram"]
+        for stage in sorted(stages, key=stage_order):
+            entry = stages[stage]
+            cumulative = 0
+            for bound, hits in zip(self.buckets, entry["buckets"]):
+                cumulative += hits
+                lines.append(f'pipeline_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'pipeline_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {entry["count"]}')
+            lines.append(f'pipeline_stage_seconds_sum{{stage="{stage}"}} {entry["sum"]}')
+            lines.append(f'pipeline_stage_seconds_count{{stage="{stage}"}} {entry["count"]}')
+
+        for name, help_text in COUNTERS.items():
+            series = sorted((labels, value) for (counter, labels), value in counters.items() if counter == name)
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in series:
+                lines.append(f"{name}{format_labels(labels)} {value}")
+
+        for name, value in sorted((extra_gauges or {}).items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def stage_order(stage):
+    return (STAGES.index(stage) if stage in STAGES else len(STAGES), stage)
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+# Shared registry for the whole process
+metrics = Metrics()
+
+
+class _TimedBody:
+    """Wraps an httpx request body and notes when its last byte has been handed to the socket"""
+
+    def __init__(self, stream, timing):
+        self._stream = stream
+        self._timing = timing
+
+    def __iter__(self):
+        sent = 0
+        for chunk in self._stream:
+            sent += len(chunk)
+            yield chunk
+        self._timing["uploaded"] = time.perf_counter()
+        self._timing["bytes"] = sent
+
+    def close(self):
+        close = getattr(self._stream, "close", None)
+        if close:
+            close()
+
+
+def http_timing_hooks(path_suffix="/audio/transcriptions"):
+    """httpx event hooks that split each transcription call into upload and model time"""
+    import httpx
+
+    timings = weakref.WeakKeyDictionary()
+
+    class TimedStream(httpx.SyncByteStream):
+        def __init__(self, body):
+            self._body = body
+
+        def __iter__(self):
+            return iter(self._body)
+
+        def close(self):
+            self._body.close()
+
+    def on_request(request):
+        if not request.url.path.endswith(path_suffix):
+            return
+        timing = {"started": time.perf_counter()}
+        timings[request] = timing
+        request.stream = TimedStream(_TimedBody(request.stream, timing))
+
+    def on_response(response):
+        timing = timings.pop(response.request, None)
+        if timing is None:
+            return
+        now = time.perf_counter()
+        uploaded = timing.get("uploaded", now)
+        metrics.observe("upload", uploaded - timing["started"])
+        metrics.observe("transcribe", now - uploaded)
+        metrics.count("pipeline_bytes_total", timing.get("bytes", 0), direction="uploaded")
+        metrics.count("pipeline_segments_total", backend="groq")
+
+    return {"request": [on_request], "response": [on_response]}
@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+
+# Event names that end a job's stream
+TERMINAL_EVENTS = ("done", "failed")
+# Finished jobs keep their history this long so late or reconnecting clients can replay it
+HISTORY_TTL_SECONDS = 15 * 60
+HEARTBEAT_SECONDS = 15
+
+
+class ProgressBus:
+    """In-process, per-job event log that subscribers can tail.
+
+    Every event gets an increasing id so a reconnecting EventSource can resume
+    from its Last-Event-ID without missing or repeating segments.
+    """
+
+    def __init__(self, history_ttl=HISTORY_TTL_SECONDS):
+        self.history_ttl = history_ttl
+        self._cond = threading.Condition()
+        self._events = {}
+        self._finished = {}
+
+    def publish(self, job_id, event, data=None):
+        with self._cond:
+            events = self._events.setdefault(job_id, [])
+            events.append({"id": len(events) + 1, "event": event, "data": data or {}})
+            if event in TERMINAL_EVENTS:
+                self._finished[job_id] = time.monotonic()
+            self._expire()
+            self._cond.notify_all()
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.history_ttl
+        for job_id, finished_at in list(self._finished.items()):
+            if finished_at < cutoff:
+                self._events.pop(job_id, None)
+                del self._finished[job_id]
+
+    def has_history(self, job_id):
+        with self._cond:
+            return job_id in self._events
+
+    def publisher(self, job_id):
+        return lambda event, data=None: self.publish(job_id, event, data)
+
+    def subscribe(self, job_id, last_event_id=0, heartbeat=HEARTBEAT_SECONDS):
+        """Yield events after last_event_id until a terminal event; None marks a heartbeat"""
+        position = last_event_id
+        while True:
+            with self._cond:
+                events = self._events.get(job_id, [])
+                if len(events) <= position:
+                    self._cond.wait(timeout=heartbeat)
+                    events = self._events.get(job_id, [])
+                pending = events[position:]
+            if not pending:
+                yield None
+                continue
+            for item in pending:
+                position = item["id"]
+                yield item
+                if item["event"] in TERMINAL_EVENTS:
+                    return
+
+
+def format_sse(item):
+    if item is None:
+        # Comment line: keeps proxies from closing an idle connection
+        return ": heartbeat\n\n"
+    return f"id: {item['id']}\nevent: {item['event']}\ndata: {json.dumps(item['data'], ensure_ascii=False)}\n\n"
+
+
+def download_progress_hook(publish):
+    """yt-dlp progress hook that forwards download progress as events"""
+    last = {"percent": -1}
+
+    def hook(status):
+        if status.get("status") != "downloading":
+            return
+        total = status.get("total_bytes") or status.get("total_bytes_estimate")
+        downloaded = status.get("downloaded_bytes") or 0
+        percent = int(downloaded * 100 / total) if total else None
+        # yt-dlp calls the hook for every block; only forward whole-percent changes
+        if percent is not None and percent == last["percent"]:
+            return
+        last["percent"] = percent
+        publish("download", {"downloaded_bytes": downloaded, "total_bytes": total, "percent": percent})
+    return hook
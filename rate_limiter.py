@@ -0,0 +1,208 @@
+import email.utils
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+# Groq quotas for the transcription model; override to match the account tier
+REQUESTS_PER_MINUTE = float(os.getenv("GROQ_REQUESTS_PER_MINUTE", 20))
+AUDIO_SECONDS_PER_HOUR = float(os.getenv("GROQ_AUDIO_SECONDS_PER_HOUR", 7200))
+
+MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", 5))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+# Lower value is served first
+INTERACTIVE = 0
+BATCH = 10
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+# How often a cancellable caller waiting for quota checks whether it is still wanted
+CANCEL_POLL_SECONDS = 0.25
+
+
+class CallCancelled(Exception):
+    """The caller gave up on this call (a hedge won the race, or the job ran out of time)"""
+
+
+class TokenBucket:
+    """Classic token bucket; not thread-safe on its own, the scheduler serialises access"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+
+def retry_after_seconds(error):
+    """Seconds from a Retry-After (or retry-after-ms) header on the error's response, if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        # Malformed header: fall back to the jittered backoff
+        return None
+    return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+def is_retryable(error):
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    try:
+        import groq
+
+        if isinstance(error, (groq.APIConnectionError, groq.APITimeoutError)):
+            return True
+    except ImportError:
+        pass
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+class TranscriptionScheduler:
+    """Paces transcription calls to the request and audio-second quotas.
+
+    Callers wait in a priority queue (interactive before batch, FIFO within a
+    priority) and only the head of the queue may take tokens, so a burst of
+    batch work never delays an interactive job. A 429 pauses every caller for
+    the server's Retry-After, which keeps the process at the quota ceiling
+    instead of alternating between bursts and rejections.
+    """
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, audio_seconds_per_hour=AUDIO_SECONDS_PER_HOUR,
+                 max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE_SECONDS, backoff_max=BACKOFF_MAX_SECONDS):
+        self.requests = TokenBucket(requests_per_minute / 60.0, requests_per_minute)
+        self.audio = TokenBucket(audio_seconds_per_hour / 3600.0, audio_seconds_per_hour)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self.stats = {"calls": 0, "retries": 0, "rate_limited": 0, "failures": 0, "waited_seconds": 0.0}
+
+    def acquire(self, audio_seconds=0.0, priority=INTERACTIVE, cancel=None):
+        ticket = (priority, next(self._sequence))
+        started = time.monotonic()
+        poll = CANCEL_POLL_SECONDS if cancel is not None else None
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    if cancel is not None and cancel.is_set():
+                        raise CallCancelled()
+                    if self._waiters[0] != ticket:
+                        self._cond.wait(timeout=poll)
+                        continue
+                    now = time.monotonic()
+                    wait = max(self._paused_until - now,
+                               self.requests.wait_time(1, now),
+                               self.audio.wait_time(audio_seconds, now))
+                    if wait <= 0:
+                        self.requests.take(1, now)
+                        self.audio.take(audio_seconds, now)
+                        self.stats["waited_seconds"] += now - started
+                        self.stats["calls"] += 1
+                        return
+                    self._cond.wait(timeout=min(wait, poll) if poll else wait)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def _count(self, name, amount=1):
+        with self._cond:
+            self.stats[name] += amount
+
+    def pause(self, seconds):
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def paused(self):
+        """True while a 429 has every caller waiting"""
+        with self._cond:
+            return self._paused_until > time.monotonic()
+
+    def saturation(self):
+        """Rough load signal: callers waiting for a slot"""
+        with self._cond:
+            return len(self._waiters)
+
+    def backoff(self, attempt):
+        # Full jitter keeps concurrent retries from lining up again
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def call(self, fn, audio_seconds=0.0, priority=INTERACTIVE, cancel=None):
+        """Run fn under the quota, retrying transient errors; cancel (an Event) abandons waits and retries"""
+        attempt = 0
+        while True:
+            self.acquire(audio_seconds, priority, cancel)
+            try:
+                return fn()
+            except Exception as e:
+                if cancel is not None and cancel.is_set():
+                    raise CallCancelled() from e
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    delay = self.backoff(attempt)
+                attempt += 1
+                self._count("retries")
+                print(f"Transcription call failed ({e}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                if getattr(e, "status_code", None) == 429:
+                    self._count("rate_limited")
+                    # The quota is shared, so every caller waits, not just this one
+                    self.pause(delay)
+                elif cancel is not None:
+                    cancel.wait(delay)
+                else:
+                    time.sleep(delay)
+
+
+def scheduled(transcribe_fn, scheduler, priority=INTERACTIVE):
+    """Wrap a transcribe(filename, data, **options) callable with quota pacing and retries.
+
+    An optional "cancel" option (anything with is_set()) lets the caller abandon the call.
+    """
+    def transcribe(filename, data, **options):
+        audio_seconds = options.get("duration") or 0.0
+        cancel = options.pop("cancel", None)
+        return scheduler.call(lambda: transcribe_fn(filename, data, **options),
+                              audio_seconds=audio_seconds, priority=priority, cancel=cancel)
+    return transcribe
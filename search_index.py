@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from transcript_cache import extract_video_id
+from transliteration import SCHEMES, contains_tamil, transliterate_multi
+
+INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "cache", "search.sqlite3"))
+# Tanglish spellings indexed next to the Tamil text, so romanised queries match too
+INDEX_SCHEMES = tuple(SCHEMES)
+MAX_RESULTS = 100
+
+# Quoted phrases or bare words in a user query
+QUERY_TERM = re.compile(r'"([^"]+)"|(\S+)')
+
+# Loose spelling key: casual Tanglish ("vanakkam") and the scholarly schemes
+# ("vaṇakkam", "vaNaghghaM") differ in aspirates, voicing and doubled letters
+ASPIRATE = re.compile(r"([bcdgjkpstz])h")
+LOOSE_LETTERS = str.maketrans("bdgjcwzq", "ptkssvlk")
+REPEAT = re.compile(r"(.)\1+")
+
+
+def document_id(source):
+    """Index key for a source: the YouTube video id when there is one, else the URL or path"""
+    return extract_video_id(source) or source
+
+
+def passages_from(transcript):
+    """(start, end, text) for each timestamped segment, or the whole text at 0 if there are none"""
+    segments = transcript.get("segments") or []
+    # Missing-span markers from a job that hit its deadline are not searchable text
+    passages = [(segment.get("start") or 0.0, segment.get("end") or 0.0, (segment.get("text") or "").strip())
+                for segment in segments if not segment.get("missing")]
+    passages = [passage for passage in passages if passage[2]]
+    if not passages and (transcript.get("text") or "").strip():
+        passages = [(0.0, transcript.get("duration") or 0.0, transcript["text"].strip())]
+    return passages
+
+
+def loose_form(text):
+    """Spelling-insensitive key for romanised text, applied alike to indexed text and queries"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = ASPIRATE.sub(r"\1", text.replace("ee", "i")).translate(LOOSE_LETTERS)
+    return REPEAT.sub(r"\1", text)
+
+
+def tanglish_forms(text):
+    """Distinct romanised and loose spellings of the Tamil in text, space-joined; empty for non-Tamil text"""
+    if not contains_tamil(text):
+        return ""
+    forms = []
+    for form in transliterate_multi(text, INDEX_SCHEMES).values():
+        for variant in (form, loose_form(form)):
+            if variant not in forms:
+                forms.append(variant)
+    return " ".join(forms)
+
+
+def term_variants(term):
+    """The term as typed plus its loose key (from the ISO romanisation for Tamil terms)"""
+    romanised = transliterate_multi(term, ("iso",))["iso"] if contains_tamil(term) else term
+    variants = [term]
+    loose = loose_form(romanised)
+    if loose.strip() and loose not in variants:
+        variants.append(loose)
+    return variants
+
+
+def fts_query(query):
+    """FTS5 expression for a user query: every word and "quoted phrase" must match.
+
+    Terms are quoted so punctuation in the query is never read as FTS syntax.
+    Each matches as typed in any column, or by its loose key in the romanised
+    column only, so Tamil and any Tanglish spelling find the same passages
+    while English words ("bad") do not pick up loose look-alikes ("pat").
+    """
+    groups = []
+    for phrase, word in QUERY_TERM.findall(query):
+        term = (phrase or word).replace('"', "").strip()
+        if term:
+            typed, *loose = term_variants(term)
+            alternatives = [f'"{typed}"'] + [f'tanglish : "{variant}"' for variant in loose]
+            groups.append("(" + " OR ".join(alternatives) + ")")
+    return " AND ".join(groups) or None
+
+
+class SearchIndex:
+    """SQLite FTS5 index of transcript segments, updated one video at a time.
+
+    Segments live in a plain table keyed by video id; triggers keep the FTS index
+    in step, so adding or replacing a video only touches that video's rows and
+    FTS5 merges its index segments incrementally, never rebuilding the whole index.
+    """
+
+    def __init__(self, db_path=INDEX_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS documents (
+                video_id TEXT PRIMARY KEY,
+                source TEXT,
+                fingerprint TEXT NOT NULL,
+                passages INTEGER NOT NULL,
+                indexed_at REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS passages (
+                id INTEGER PRIMARY KEY,
+                video_id TEXT NOT NULL,
+                start_ms INTEGER NOT NULL,
+                end_ms INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                tanglish TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS passages_video ON passages (video_id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS passages_fts USING fts5(
+                text, tanglish, content = 'passages', content_rowid = 'id',
+                tokenize = 'unicode61 remove_diacritics 2');
+            CREATE TRIGGER IF NOT EXISTS passages_insert AFTER INSERT ON passages BEGIN
+                INSERT INTO passages_fts (rowid, text, tanglish) VALUES (new.id, new.text, new.tanglish);
+            END;
+            CREATE TRIGGER IF NOT EXISTS passages_delete AFTER DELETE ON passages BEGIN
+                INSERT INTO passages_fts (passages_fts, rowid, text, tanglish)
+                VALUES ('delete', old.id, old.text, old.tanglish);
+            END;
+        """)
+
+    def add_transcript(self, video_id, transcript, source=None):
+        """Index (or re-index) one video's transcript; returns the number of passages written.
+
+        A transcript identical to the one already indexed for the video is skipped,
+        so cache hits cost a single lookup.
+        """
+        passages = passages_from(transcript)
+        fingerprint = hashlib.sha256(json.dumps(passages, ensure_ascii=False).encode("utf-8")).hexdigest()
+        with self._lock:
+            row = self._db.execute("SELECT fingerprint FROM documents WHERE video_id = ?", (video_id,)).fetchone()
+        if row and row[0] == fingerprint:
+            return 0
+
+        # Transliterate outside the lock; it is the slow part for long Tamil transcripts
+        rows = [(video_id, int(round(start * 1000)), int(round(end * 1000)), text, tanglish_forms(text))
+                for start, end, text in passages]
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM passages WHERE video_id = ?", (video_id,))
+            self._db.executemany(
+                "INSERT INTO passages (video_id, start_ms, end_ms, text, tanglish) VALUES (?, ?, ?, ?, ?)", rows)
+            self._db.execute(
+                "INSERT OR REPLACE INTO documents (video_id, source, fingerprint, passages, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?)", (video_id, source, fingerprint, len(rows), time.time()))
+        print(f"Indexed {len(rows)} passages for {video_id}")
+        return len(rows)
+
+    def remove(self, video_id):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM passages WHERE video_id = ?", (video_id,))
+            self._db.execute("DELETE FROM documents WHERE video_id = ?", (video_id,))
+
+    def search(self, query, limit=20, video_id=None):
+        """Best-ranked hits: [{video_id, source, start_ms, end_ms, text, snippet}]"""
+        expression = fts_query(query)
+        if expression is None:
+            return []
+        sql = """
+            SELECT p.video_id, d.source, p.start_ms, p.end_ms, p.text,
+                   snippet(passages_fts, -1, '[', ']', '...', 12)
+            FROM passages_fts
+            JOIN passages p ON p.id = passages_fts.rowid
+            LEFT JOIN documents d ON d.video_id = p.video_id
+            WHERE passages_fts MATCH ?"""
+        args = [expression]
+        if video_id:
+            sql += " AND p.video_id = ?"
+            args.append(video_id)
+        sql += " ORDER BY bm25(passages_fts) LIMIT ?"
+        args.append(max(1, min(int(limit), MAX_RESULTS)))
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+        return [{"video_id": row[0], "source": row[1], "start_ms": row[2], "end_ms": row[3],
+                 "text": row[4], "snippet": row[5]} for row in rows]
+
+    def stats(self):
+        with self._lock:
+            videos, passages = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(passages), 0) FROM documents").fetchone()
+        return {"videos": videos, "passages": passages}
@@ -0,0 +1,89 @@
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+
+# Encoded segments are written here (system temp dir if unset) instead of being held in memory
+SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+SPOOL_UPLOADS = os.getenv("SPOOL_UPLOADS", "1") == "1"
+SPOOL_BLOCK_SIZE = 1024 * 1024
+
+
+class SpooledAudio:
+    """An encoded upload kept on disk.
+
+    Passed around in place of the bytes; every send opens the file again, so a
+    retried request re-reads it from the start and nothing is ever read whole.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __len__(self):
+        return os.path.getsize(self.path)
+
+    def __bool__(self):
+        return True
+
+    def open(self):
+        return open(self.path, "rb")
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __repr__(self):
+        return f"SpooledAudio({self.path!r})"
+
+
+@contextmanager
+def open_payload(data):
+    """Binary file object over an upload payload, whether it is bytes or a SpooledAudio"""
+    if isinstance(data, SpooledAudio):
+        with data.open() as f:
+            yield f
+    else:
+        yield io.BytesIO(data)
+
+
+@contextmanager
+def payload_view(data):
+    """Read-only buffer over a payload: a memory map for spooled files, the bytes otherwise"""
+    if not isinstance(data, SpooledAudio):
+        yield data
+    elif len(data) == 0:
+        # mmap refuses empty files
+        yield b""
+    else:
+        with data.open() as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            yield view
+
+
+def payload_digest(data):
+    """SHA-256 of a payload; spooled files are hashed through a memory map, not copied"""
+    with payload_view(data) as view:
+        return hashlib.sha256(view).hexdigest()
+
+
+@contextmanager
+def spool_directory(enabled=SPOOL_UPLOADS):
+    """Scratch directory for one job's encoded segments, removed afterwards; None when spooling is off"""
+    if not enabled:
+        yield None
+        return
+    with tempfile.TemporaryDirectory(prefix="spool_", dir=SPOOL_DIR) as directory:
+        yield directory
+
+
+def spool_stream(source, path, block_size=SPOOL_BLOCK_SIZE):
+    """Copy a readable binary stream to path block by block; returns the SHA-256 of its bytes"""
+    digest = hashlib.sha256()
+    with open(path, "wb") as f:
+        for block in iter(lambda: source.read(block_size), b""):
+            digest.update(block)
+            f.write(block)
+    return digest.hexdigest()
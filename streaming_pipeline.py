@@ -0,0 +1,314 @@
+import concurrent.futures
+import hashlib
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_preprocess import UPLOAD_FORMAT, pcm_audio
+from core import get_media_resolver
+from hedging import HEDGE_REQUESTS, hedged
+from language_router import LANGUAGE_ROUTING, TRANSCRIPTION_LANGUAGE
+from media_resolver import FFMPEG_LOCATION
+from metrics import metrics
+from spool import spool_directory
+from transcription_engine import (DEFAULT_WORKERS, JOB_DEADLINE_SECONDS, Segment, SegmentResult, apply_routing,
+                                  deadline_remaining, encode_segment, has_speech, make_router, missing_marker,
+                                  missing_result, report_sent_audio, stitch_results, transcribe_segment)
+from vad import VAD_ENABLED, pack_pcm, speech_regions
+
+# Audio is decoded straight to what Whisper wants: 16 kHz mono 16-bit PCM
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 2
+BYTES_PER_SECOND = SAMPLE_RATE * BYTES_PER_SAMPLE
+READ_SIZE = 64 * 1024
+
+# Short segments keep time-to-first-text low while the rest is still arriving
+STREAM_SEGMENT_SECONDS = 120
+# Look back this far from the segment limit for the quietest point to cut on
+STREAM_SEARCH_SECONDS = 10
+FRAME_MS = 20
+# After the deadline, how long to let the decoder thread finish before assuming it is stalled
+STOP_GRACE_SECONDS = 0.25
+
+
+def ffmpeg_binary():
+    if FFMPEG_LOCATION and os.path.exists(FFMPEG_LOCATION):
+        return FFMPEG_LOCATION
+    return "ffmpeg"
+
+
+def resolve_stream(url):
+    """Direct media URL and request headers for the chosen audio-only format"""
+    return get_media_resolver().stream_source(url)
+
+
+def decode_stream(source, headers=None, sample_rate=SAMPLE_RATE, channels=1, sample_format="s16le"):
+    """Yield raw PCM blocks from ffmpeg while it is still reading the source"""
+    command = [ffmpeg_binary(), "-nostdin", "-loglevel", "error"]
+    if headers:
+        command += ["-headers", "".join(f"{key}: {value}\r\n" for key, value in headers.items())]
+    command += ["-i", source, "-f", sample_format, "-ac", str(channels), "-ar", str(sample_rate), "pipe:1"]
+
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        for block in iter(lambda: process.stdout.read(READ_SIZE), b""):
+            yield block
+    finally:
+        process.stdout.close()
+        if process.wait() != 0:
+            error = process.stderr.read().decode("utf-8", "replace").strip()
+            process.stderr.close()
+            raise RuntimeError(f"ffmpeg failed to decode {source}: {error}")
+        process.stderr.close()
+
+
+def is_pcm_wav(path):
+    """True if path is already 16 kHz mono 16-bit WAV, readable without ffmpeg"""
+    try:
+        with wave.open(path, "rb") as wav:
+            return (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) == (SAMPLE_RATE, 1, BYTES_PER_SAMPLE)
+    except (wave.Error, EOFError):
+        return False
+
+
+def can_decode_file(path):
+    return is_pcm_wav(path) or shutil.which(ffmpeg_binary()) is not None
+
+
+def decode_file(path):
+    """PCM blocks of a local file: read as-is when already 16 kHz mono 16-bit WAV, else decoded by ffmpeg"""
+    return read_wav(path) if is_pcm_wav(path) else decode_stream(path)
+
+
+def read_wav(path):
+    with wave.open(path, "rb") as wav:
+        frames = READ_SIZE // BYTES_PER_SAMPLE
+        for block in iter(lambda: wav.readframes(frames), b""):
+            yield block
+
+
+def quietest_cut(pcm, search_start):
+    """Byte offset of the lowest-energy frame at or after search_start"""
+    import numpy as np
+
+    frame_bytes = BYTES_PER_SECOND * FRAME_MS // 1000
+    samples = np.frombuffer(pcm[search_start:], dtype=np.int16).astype(np.float32)
+    frame_samples = frame_bytes // BYTES_PER_SAMPLE
+    frames = len(samples) // frame_samples
+    if frames == 0:
+        return len(pcm)
+    energy = np.square(samples[:frames * frame_samples]).reshape(frames, frame_samples).mean(axis=1)
+    return search_start + int(np.argmin(energy)) * frame_bytes
+
+
+def cut_segments(pcm_blocks, segment_seconds=STREAM_SEGMENT_SECONDS,
+                 search_seconds=STREAM_SEARCH_SECONDS, name="stream", digest=None, vad=VAD_ENABLED, spool_dir=None):
+    """Turn a stream of PCM blocks into encoded segments as soon as each one is complete"""
+    segment_bytes = segment_seconds * BYTES_PER_SECOND
+    search_bytes = search_seconds * BYTES_PER_SECOND
+    buffer = bytearray()
+    offset_bytes = 0
+    index = 0
+
+    def emit(length):
+        with metrics.span("preprocess"):
+            return _emit(length)
+
+    def _emit(length):
+        nonlocal offset_bytes, index
+        pcm = bytes(buffer[:length])
+        del buffer[:length]
+        start = offset_bytes / BYTES_PER_SECOND
+        spans = None
+        if vad:
+            # Upload only the speech in this segment; an empty span list skips the call entirely
+            import numpy as np
+
+            regions = [(start + s, start + e) for s, e in speech_regions(np.frombuffer(pcm, dtype=np.int16))]
+            pcm, spans = pack_pcm(pcm, regions, offset=start)
+        filename = f"{name}_{index:04d}.{UPLOAD_FORMAT}"
+        segment = Segment(
+            index=index,
+            start=start,
+            end=(offset_bytes + length) / BYTES_PER_SECOND,
+            filename=filename,
+            data=encode_segment(pcm_audio(pcm, SAMPLE_RATE), filename, spool_dir) if pcm else b"",
+            spans=spans,
+        )
+        offset_bytes += length
+        index += 1
+        return segment
+
+    for block in pcm_blocks:
+        if digest is not None:
+            digest.update(block)
+        buffer.extend(block)
+        while len(buffer) >= segment_bytes:
+            cut = quietest_cut(buffer[:segment_bytes], segment_bytes - search_bytes)
+            # Keep whole samples and never emit an empty segment
+            cut -= cut % BYTES_PER_SAMPLE
+            yield emit(cut if cut > 0 else segment_bytes)
+    if buffer:
+        yield emit(len(buffer) - len(buffer) % BYTES_PER_SAMPLE)
+
+
+def iter_stream_transcription(source, transcribe_fn, headers=None, max_workers=DEFAULT_WORKERS,
+                              segment_seconds=STREAM_SEGMENT_SECONDS, digest=None):
+    """Yield SegmentResults in order while later segments are still being decoded"""
+    return iter_pcm_transcription(decode_stream(source, headers), transcribe_fn, max_workers=max_workers,
+                                  segment_seconds=segment_seconds, digest=digest)
+
+
+def drain(results):
+    """Segments already queued, without waiting for more (the end-of-queue None is dropped)"""
+    items = []
+    while True:
+        try:
+            item = results.get_nowait()
+        except queue.Empty:
+            return items
+        if item is not None:
+            items.append(item)
+
+
+def iter_pcm_transcription(pcm_blocks, transcribe_fn, max_workers=DEFAULT_WORKERS,
+                           segment_seconds=STREAM_SEGMENT_SECONDS, digest=None, vad=VAD_ENABLED, spool_dir=None,
+                           name="stream", router=None, deadline=None):
+    """Yield SegmentResults in order from any iterator of 16 kHz mono s16le blocks.
+
+    At the deadline (time.monotonic()) decoding stops and unfinished calls are
+    cancelled: segments already done are still yielded, the rest come back as
+    missing results, followed by a marker for the audio never decoded.
+    """
+    results = queue.Queue()
+    producer_error = []
+    # Bound the segments held in memory when decoding outruns transcription
+    in_flight = threading.Semaphore(max_workers * 2)
+    stop = threading.Event()
+    # Set only when cut_segments ran to the end of the audio, not when the deadline stopped it
+    decoded = threading.Event()
+    # Held while a segment is handed over, so none is queued after the consumer has stopped
+    handoff = threading.Lock()
+    cancel = threading.Event() if deadline is not None else None
+
+    def produce(executor):
+        segments = cut_segments(pcm_blocks, segment_seconds, name=name, digest=digest, vad=vad,
+                                spool_dir=spool_dir)
+        try:
+            for segment in segments:
+                if router and not router.decided and has_speech(segment):
+                    # Probe before the first segment with speech goes out; the rest are pinned
+                    router.detect(segment, transcribe_fn, cancel=cancel)
+                in_flight.acquire()
+                with handoff:
+                    if stop.is_set():
+                        break
+                    future = executor.submit(transcribe_segment, segment, transcribe_fn, router, cancel)
+                    future.add_done_callback(lambda _: in_flight.release())
+                    results.put((segment, future))
+            else:
+                decoded.set()
+        except Exception as e:
+            producer_error.append(e)
+        finally:
+            # Stops the decoder too when the deadline cut the stream short
+            segments.close()
+            results.put(None)
+
+    def stop_at_deadline():
+        """Stop decoding and cancel the calls in flight; returns the segments already queued"""
+        with handoff:
+            stop.set()
+        cancel.set()
+        # Let a producer blocked on the in-flight bound see the stop
+        in_flight.release()
+        return drain(results)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    producer = threading.Thread(target=produce, args=(executor,), daemon=True)
+    producer.start()
+    late = None
+    last = None
+    try:
+        # Futures are queued in segment order, so waiting on them in turn keeps the order
+        while True:
+            try:
+                # A slow or stalled decoder must not hold the job past its deadline either
+                item = results.get(timeout=deadline_remaining(deadline))
+            except queue.Empty:
+                print(f"Deadline reached while decoding, after {last.end if last else 0.0:.1f}s of the stream")
+                late = stop_at_deadline()
+                break
+            if item is None:
+                producer.join()
+                break
+            segment, future = item
+            try:
+                result = future.result(timeout=deadline_remaining(deadline))
+            except concurrent.futures.TimeoutError:
+                print(f"Deadline reached at {segment.start:.1f}s of the stream")
+                late = [item] + stop_at_deadline()
+                break
+            last = segment
+            yield result
+        if late is not None:
+            for segment, future in late:
+                finished = future.done() and not future.cancelled() and future.exception() is None
+                yield future.result() if finished else missing_result(segment)
+                last = segment
+            # A producer that already hit the end of the audio sets decoded on its way out; a
+            # stalled one is not waited for
+            producer.join(timeout=STOP_GRACE_SECONDS)
+            if not decoded.is_set():
+                # The rest of the stream was never decoded: its length is unknown, so mark where it starts
+                end = last.end if last else 0.0
+                yield SegmentResult(index=last.index + 1 if last else 0, start=end, end=end,
+                                    text=missing_marker(end), missing=True)
+    finally:
+        executor.shutdown(wait=late is None, cancel_futures=late is not None)
+    # After the deadline the decoder was stopped on purpose; its errors are not the job's
+    if producer_error and late is None:
+        raise producer_error[0]
+
+
+def stream_transcribe(url, transcribe_fn, max_workers=DEFAULT_WORKERS,
+                      segment_seconds=STREAM_SEGMENT_SECONDS, on_segment=None, deadline=None):
+    """Transcribe a URL while it downloads; returns (Transcript, sha256 of the decoded audio)"""
+    if deadline is None and JOB_DEADLINE_SECONDS:
+        deadline = time.monotonic() + JOB_DEADLINE_SECONDS
+    source, headers, info = resolve_stream(url)
+    with spool_directory() as spool_dir:
+        return transcribe_pcm(decode_stream(source, headers), transcribe_fn, max_workers=max_workers,
+                              segment_seconds=segment_seconds, on_segment=on_segment, spool_dir=spool_dir,
+                              deadline=deadline)
+
+
+def transcribe_pcm(pcm_blocks, transcribe_fn, max_workers=DEFAULT_WORKERS,
+                   segment_seconds=STREAM_SEGMENT_SECONDS, on_segment=None, vad=VAD_ENABLED, spool_dir=None,
+                   name="stream", router=None, route_language=LANGUAGE_ROUTING, language=TRANSCRIPTION_LANGUAGE,
+                   hedge=HEDGE_REQUESTS, deadline=None):
+    """Transcribe 16 kHz mono s16le blocks as they arrive; returns (Transcript, sha256 of the PCM)"""
+    if hedge:
+        transcribe_fn = hedged(transcribe_fn)
+    if router is None:
+        router = make_router(route_language, language)
+    started = time.perf_counter()
+    digest = hashlib.sha256()
+    collected = []
+    for result in iter_pcm_transcription(pcm_blocks, transcribe_fn, max_workers=max_workers,
+                                         segment_seconds=segment_seconds, digest=digest, vad=vad,
+                                         spool_dir=spool_dir, name=name, router=router, deadline=deadline):
+        if not collected:
+            print(f"First segment transcribed after {time.perf_counter() - started:.1f}s")
+        collected.append(result)
+        if on_segment:
+            on_segment(result)
+    print(f"Streamed and transcribed {len(collected)} segments in {time.perf_counter() - started:.1f}s")
+    transcript = apply_routing(stitch_results(collected), router)
+    report_sent_audio(transcript)
+    return transcript, digest.hexdigest()
@@ -1,82 +1,128 @@
+import hashlib
 import os
 import streamlit as st
-from groq import Groq
-from dotenv import load_dotenv
-import yt_dlp
-from indic_transliteration import sanscript
-from indic_transliteration.sanscript import transliterate
-import re
-
-# Load environment variables
-load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-if not GROQ_API_KEY:
-    raise ValueError("GROQ_API_KEY is not set in the .env file!")
-
-print("Groq API Key Loaded Successfully")
-
-# Initialize the Groq client
-client = Groq(api_key=GROQ_API_KEY)
-
-def download_audio_from_youtube(url, output_folder="downloads"):
-    print(f"Downloading audio from URL: {url}")
-    os.makedirs(output_folder, exist_ok=True)
-    ydl_opts = {
-        'format': 'bestaudio/best',
-        'outtmpl': os.path.join(output_folder, 'audio.%(ext)s'),
-    }
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
-        audio_path = os.path.join(output_folder, 'audio.webm')
-        if os.path.exists(audio_path):
-            print(f"Audio file downloaded successfully: {audio_path}")
-            return audio_path
-    except Exception as e:
-        print(f"Error downloading audio: {e}")
-        st.error(f"Error downloading audio: {e}")
-    return None
-
-def transcribe_audio(file_path):
+from chunker import chunk_transcript, format_label
+from backends import BACKEND_NAMES, DEFAULT_BACKEND, backend_model, get_backend
+from core import get_api_key
+from downloader import download_audio_from_youtube
+from metrics import STAGES, metrics
+from progress import download_progress_hook
+from spool import spool_stream
+from transcription_engine import DEFAULT_RESPONSE_FORMAT, transcribe_long_audio, transcript_to_dict
+from transcript_cache import TranscriptCache, hash_file, make_key, transcription_params
+from transliteration import SCHEMES, transliterate, transliteration_needed
+from workspace import workspaces
+
+# Uploads are copied to disk in blocks of this size instead of all at once
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+
+# Check the API key up front; the Groq client is built lazily and shared across reruns
+if DEFAULT_BACKEND in ("groq", "auto"):
+    get_api_key()
+    print("Groq API Key Loaded Successfully")
+
+# One transcript cache per server process, shared by every session; keyed on audio hash and URL
+@st.cache_resource
+def get_transcript_cache():
+    return TranscriptCache()
+
+def cache_params(backend):
+    # Only the model id is needed here; building the backend would set up its client or load its model
+    return transcription_params(backend_model(backend), response_format=DEFAULT_RESPONSE_FORMAT)
+
+def save_upload(uploaded_file, path):
+    """Copy an upload to disk block by block; returns the SHA-256 of its bytes"""
+    uploaded_file.seek(0)
+    return spool_stream(uploaded_file, path, block_size=UPLOAD_BLOCK_SIZE)
+
+def download_audio(url, workspace):
+    # yt-dlp reports progress from this thread, so the bar can be updated directly
+    progress_bar = st.progress(0, text="Downloading...")
+
+    def show_progress(event, data):
+        if data.get("percent") is not None:
+            progress_bar.progress(min(data["percent"], 100), text=f"Downloading... {data['percent']}%")
+
+    audio_path = download_audio_from_youtube(url, workspace.path,
+                                             progress_hook=download_progress_hook(show_progress))
+    progress_bar.empty()
+    if audio_path:
+        print(f"Audio file downloaded successfully: {audio_path}")
+    else:
+        st.error("Error downloading audio, see the server log for details")
+    return audio_path
+
+def transcribe_audio(file_path, live_view=None, backend=None, audio_hash=None):
+    """Transcript dict for the file, from the cache when this audio was seen before; returns (key, transcript)"""
+    cache = get_transcript_cache()
+    key = make_key(audio_hash or hash_file(file_path), cache_params(backend))
+    cached = cache.get(key)
+    if cached:
+        print(f"Cache hit for audio: {key}")
+        return key, cached
+
     print(f"Starting transcription for file: {file_path}")
-    with open(file_path, "rb") as file:
-        transcription = client.audio.transcriptions.create(
-            file=(file_path, file.read()),
-            model="whisper-large-v3-turbo",
-            response_format="json",
-            temperature=0.0
-        )
+    received = {}
+
+    # Show the partial transcript in segment order as each piece comes back
+    def show_segment(result):
+        received[result.index] = result.text
+        live_view.text(" ".join(received[index] for index in sorted(received)))
+
+    # Split on silences and transcribe the pieces concurrently
+    transcript = transcript_to_dict(transcribe_long_audio(file_path, get_backend(backend),
+                                                          on_segment=show_segment if live_view else None))
+    # A transcript cut short by the job deadline is shown but not cached, so a rerun can complete it
+    if not transcript.get("missing"):
+        cache.put(key, transcript)
     print("Transcription completed")
-    return transcription.text if transcription else None
-
-def split_transcription(text, words_per_chunk=70):
-    words = text.split()
-    chunks = []
-    start_time = 0
-    while start_time < len(words):
-        end_time = start_time + words_per_chunk
-        chunk_text = " \n" + " ".join(words[start_time:end_time]) + "\n"
-        chunks.append((start_time, end_time, chunk_text))
-        start_time = end_time
-    return chunks
-
-def transliterate_tamil_to_tanglish(text):
-    return transliterate(text, sanscript.TAMIL, sanscript.ITRANS)
-
-# Function to check if text contains Tamil characters
-def contains_tamil(text):
-    tamil_pattern = re.compile(r'[\u0B80-\u0BFF]')
-    return bool(tamil_pattern.search(text))
-
-# Function to delete the file
-def delete_file(file_path):
-    try:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            print(f"Deleted file: {file_path}")
-    except Exception as e:
-        print(f"Error deleting file: {e}")
-        st.error(f"Error deleting file: {e}")
+    return key, transcript
+
+# Cache key for the views of a transcript. A partial one (cut at the job deadline) is keyed on
+# its content too, so completing the same audio later does not show the stale partial views
+def view_key(key, transcript):
+    if not transcript.get("missing"):
+        return key
+    return f"{key}:partial:{hashlib.sha256(transcript['text'].encode('utf-8')).hexdigest()[:16]}"
+
+# Chunking and transliteration are pure functions of the transcript, so reruns
+# (tab switches, scheme changes, other widgets) reuse them instead of recomputing
+@st.cache_data(max_entries=256, show_spinner=False)
+def split_transcription(transcript_key, _transcript):
+    # Real 30-second windows from the segment timestamps
+    return chunk_transcript(_transcript["segments"], _transcript.get("words"))
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def render_view(transcript_key, _transcript, scheme=None):
+    chunks = split_transcription(transcript_key, _transcript)
+    if scheme is None:
+        return format_chunks(chunks)
+    # Decided once per job from the language probe; non-Tamil transcripts skip the pass entirely
+    if not transliteration_needed(_transcript):
+        return None
+    # Transliterate chunk by chunk so the timestamps carry over
+    return format_chunks(chunks, lambda text: transliterate(text, scheme))
+
+def show_metrics(summary):
+    # Stage timings and counters recorded process-wide while this result was produced. The registry
+    # is shared by every session on this server, so other users' jobs running at the same time show up too
+    with st.expander("📊 Pipeline metrics (whole server, during this run)"):
+        st.caption("Includes any other transcriptions running on this server at the same time.")
+        rows = [{"stage": stage, "calls": entry["count"], "total s": round(entry["seconds"], 2),
+                 "mean s": round(entry["mean"], 3)}
+                for stage, entry in summary["stages"].items() if entry["count"]]
+        rows.sort(key=lambda row: STAGES.index(row["stage"]) if row["stage"] in STAGES else len(STAGES))
+        st.table(rows)
+        for name, value in sorted(summary["counters"].items()):
+            if value:
+                st.write(f"`{name}`: {value:,.1f}")
+
+def format_chunks(chunks, transform=None):
+    return "\n".join(
+        f"⏱️ {format_label(chunk['start'])}-{format_label(chunk['end'])}:\n"
+        f"{transform(chunk['text']) if transform else chunk['text']}\n"
+        for chunk in chunks
+    )
 
 # Custom CSS for styling
 st.markdown("""
@@ -106,10 +152,19 @@ with st.sidebar:
     st.header("⚙️ Settings")
     option = st.radio("Input Source:", ["YouTube URL", "Local File Upload"], 
                      help="Choose your audio source")
+    scheme = st.selectbox("Tanglish scheme:", list(SCHEMES),
+                          help="Romanisation used for the Tanglish view")
+    backend = st.selectbox("Transcription backend:", BACKEND_NAMES, index=BACKEND_NAMES.index(DEFAULT_BACKEND),
+                           help="groq: remote API, local: CPU faster-whisper, auto: Groq with local fallback")
 
 # Main Content Area
 main_container = st.container()
 
+# The last result survives reruns (tab switches, sidebar changes) in session state
+def keep_result(key, transcript, source, metrics_before):
+    st.session_state["result"] = {"key": view_key(key, transcript), "transcript": transcript, "source": source,
+                                  "metrics": metrics.summary(since=metrics_before)}
+
 with main_container:
     if option == "YouTube URL":
         with st.form("youtube_form"):
@@ -119,15 +174,26 @@ with main_container:
             submitted = st.form_submit_button("🚀 Start Transcription")
             
             if submitted and youtube_url:
-                with st.status("🔍 Processing...", expanded=True) as status:
-                    st.write("📥 Downloading audio from YouTube...")
-                    audio_file_path = download_audio_from_youtube(youtube_url)
-                    if audio_file_path:
-                        st.write("🔊 Transcribing audio...")
-                        transcription_text = transcribe_audio(audio_file_path)
-                        status.update(label="✅ Transcription Complete!", 
-                                     state="complete", expanded=False)
-                        delete_file(audio_file_path)
+                metrics_before = metrics.summary()
+                params = cache_params(backend)
+                cached_key = get_transcript_cache().url_key(youtube_url, params)
+                cached = get_transcript_cache().get(cached_key) if cached_key else None
+                if cached:
+                    # Seen this video before: no download, no transcription
+                    keep_result(cached_key, cached, youtube_url, metrics_before)
+                else:
+                    # Each run gets its own scratch directory, removed once transcribed
+                    with st.status("🔍 Processing...", expanded=True) as status, workspaces.create() as workspace:
+                        st.write("📥 Downloading audio from YouTube...")
+                        audio_file_path = download_audio(youtube_url, workspace)
+                        if audio_file_path:
+                            st.write("🔊 Transcribing audio...")
+                            key, transcript = transcribe_audio(audio_file_path, live_view=st.empty(), backend=backend)
+                            if not transcript.get("missing"):
+                                get_transcript_cache().link_url(youtube_url, params, key)
+                            keep_result(key, transcript, youtube_url, metrics_before)
+                            status.update(label="✅ Transcription Complete!", 
+                                         state="complete", expanded=False)
 
     else:
         with st.form("upload_form"):
@@ -137,44 +203,39 @@ with main_container:
             submitted = st.form_submit_button("🚀 Start Transcription")
             
             if submitted and uploaded_file:
-                with st.status("🔍 Processing...", expanded=True) as status:
+                metrics_before = metrics.summary()
+                with st.status("🔍 Processing...", expanded=True) as status, workspaces.create() as workspace:
                     st.write("📤 Uploading file...")
-                    temp_audio_path = os.path.join("downloads", uploaded_file.name)
-                    with open(temp_audio_path, "wb") as f:
-                        f.write(uploaded_file.getbuffer())
+                    temp_audio_path = workspace.file(os.path.basename(uploaded_file.name))
+                    audio_hash = save_upload(uploaded_file, temp_audio_path)
                     st.write("🔊 Transcribing audio...")
-                    transcription_text = transcribe_audio(temp_audio_path)
+                    key, transcript = transcribe_audio(temp_audio_path, live_view=st.empty(), backend=backend,
+                                                       audio_hash=audio_hash)
+                    keep_result(key, transcript, uploaded_file.name, metrics_before)
                     status.update(label="✅ Transcription Complete!", 
                                  state="complete", expanded=False)
-                    delete_file(temp_audio_path)
 
     # Display Results
-    if 'transcription_text' in locals():
+    result = st.session_state.get("result")
+    if result and result["transcript"]:
         st.subheader("📝 Transcription Results")
+        st.caption(f"Source: {result['source']}")
         
         # Create tabs for different views
         tab1, tab2 = st.tabs(["Original Text", "Tanglish Translation"])
         
         with tab1:
-            chunks = split_transcription(transcription_text)
-            transcription_display = "\n".join(
-                [f"⏱️ {start}-{start+30}s:\n{chunk}" 
-                 for start, end, chunk in chunks]
-            )
-            st.code(transcription_display, language="text")
+            st.code(render_view(result["key"], result["transcript"]), language="text")
             
         with tab2:
-            if contains_tamil(transcription_text):
-                tanglish_text = transliterate_tamil_to_tanglish(transcription_text)
-                tanglish_chunks = split_transcription(tanglish_text)
-                tanglish_display = "\n".join(
-                    [f"⏱️ {start}-{start+30}s:\n{chunk}" 
-                     for start, end, chunk in tanglish_chunks]
-                )
-                st.code(tanglish_display, language="text")
+            tanglish = render_view(result["key"], result["transcript"], scheme)
+            if tanglish is not None:
+                st.code(tanglish, language="text")
             else:
                 st.info("🔍 No Tamil text detected for transliteration")
 
+        show_metrics(result["metrics"])
+
 # Footer
 st.markdown("---")
 st.markdown('<div class="footer">🎉 Powered by Groq & Streamlit | Made with ❤️ by Your Name</div>', 
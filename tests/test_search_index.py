@@ -0,0 +1,25 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import SearchIndex
+
+
+def transcript(*texts):
+    return {"segments": [{"start": 10.0 * index, "end": 10.0 * index + 5, "text": text}
+                         for index, text in enumerate(texts)]}
+
+
+def test_english_query_ignores_loose_key_lookalikes(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.sqlite3"))
+    index.add_transcript("en", transcript("a pat on the back", "that was a bad call"))
+    hits = index.search("bad")
+    assert [hit["text"] for hit in hits] == ["that was a bad call"]
+
+
+def test_tanglish_query_matches_tamil_text_by_loose_key(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.sqlite3"))
+    index.add_transcript("ta", transcript("வணக்கம் நண்பர்களே", "a pat on the back"))
+    hits = index.search("vanakkam")
+    assert [hit["text"] for hit in hits] == ["வணக்கம் நண்பர்களே"]
@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streaming_pipeline
+from rate_limiter import CallCancelled
+from streaming_pipeline import BYTES_PER_SECOND, transcribe_pcm
+
+
+@pytest.fixture(autouse=True)
+def raw_uploads(monkeypatch):
+    # Upload the raw PCM, so no encoder (or ffmpeg) is needed
+    monkeypatch.setattr(streaming_pipeline, "encode_segment", lambda audio, filename, spool_dir=None: audio.raw_data)
+
+
+def pcm_blocks(seconds, block_seconds=10, delay=0.0):
+    """Noise in blocks, arriving delay seconds apart (a slow decoder)"""
+    rng = np.random.default_rng(0)
+    for _ in range(int(seconds // block_seconds)):
+        time.sleep(delay)
+        yield rng.normal(0, 3000, block_seconds * BYTES_PER_SECOND // 2).astype(np.int16).tobytes()
+
+
+def fake_transcriber(latency, slow=()):
+    """transcribe(filename, data, **options) that takes latency seconds (10x for slow segment indexes)"""
+    def transcribe(filename, data, cancel=None, **options):
+        index = int(os.path.splitext(filename)[0].rsplit("_", 1)[1])
+        delay = latency * (10 if index in slow else 1)
+        if cancel is not None:
+            if cancel.wait(delay):
+                raise CallCancelled()
+        else:
+            time.sleep(delay)
+        return {"text": f"segment {index}", "segments": []}
+    return transcribe
+
+
+def run(seconds, transcribe_fn, deadline_seconds, delay=0.0):
+    transcript, _ = transcribe_pcm(pcm_blocks(seconds, delay=delay), transcribe_fn, max_workers=2, segment_seconds=30, vad=False,
+                                   route_language=False, hedge=False,
+                                   deadline=time.monotonic() + deadline_seconds)
+    return transcript
+
+
+def test_no_deadline_hit_keeps_every_segment():
+    transcript = run(120, fake_transcriber(0.01), deadline_seconds=30)
+    assert transcript.missing == []
+    texts = [segment["text"] for segment in transcript.segments]
+    assert texts == [f"segment {index}" for index in range(len(texts))]
+    assert transcript.duration == pytest.approx(120, abs=1)
+
+
+def test_deadline_mid_stream_marks_the_undecoded_tail():
+    started = time.monotonic()
+    transcript = run(300, fake_transcriber(0.4), deadline_seconds=1.0)
+    assert time.monotonic() - started < 3
+    # Some segments made it, the rest of the stream is marked rather than dropped
+    assert any(not segment.get("missing") for segment in transcript.segments)
+    tail = transcript.segments[-1]
+    assert tail["missing"] and tail["start"] == tail["end"] < 300
+    assert tail["text"] == f"[missing from {tail['start']:.1f}s]"
+    assert transcript.missing[-1] == {"start": tail["start"], "end": tail["end"]}
+
+
+def test_deadline_after_decoding_finished_has_no_tail_marker():
+    # Everything is decoded at once; only segment 1 is still running at the deadline
+    transcript = run(90, fake_transcriber(0.05, slow={1}), deadline_seconds=0.3)
+    assert transcript.missing == [{"start": transcript.segments[1]["start"], "end": transcript.segments[1]["end"]}]
+    assert transcript.segments[-1]["text"] == f"segment {len(transcript.segments) - 1}"
+    assert transcript.duration == pytest.approx(90, abs=1)
+
+
+def test_deadline_fires_while_the_decoder_is_slow():
+    # 10 s of audio per second: the whole 300 s would take 30 s to decode
+    started = time.monotonic()
+    transcript = run(300, fake_transcriber(0.01), deadline_seconds=1.0, delay=1.0)
+    # The first 30 s segment is only complete after 3 s: the deadline must not wait for it
+    assert time.monotonic() - started < 2.0
+    tail = transcript.segments[-1]
+    assert tail["missing"] and tail["start"] == tail["end"] < 300
+    assert transcript.missing
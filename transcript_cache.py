@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "transcripts")
+# Evict least recently used transcripts once the cache grows past this size
+MAX_CACHE_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(file_path):
+    """SHA-256 of the audio bytes, read in blocks so large files stay out of memory"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def transcription_params(model, prompt=None, temperature=0.0, response_format="json"):
+    return {
+        "model": model,
+        "prompt": prompt,
+        "temperature": temperature,
+        "response_format": response_format,
+    }
+
+
+def params_key(params):
+    encoded = json.dumps(params, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def make_key(audio_hash, params):
+    return hashlib.sha256(f"{audio_hash}:{params_key(params)}".encode("utf-8")).hexdigest()
+
+
+def extract_video_id(url):
+    """Best-effort YouTube video id from the common URL shapes, None if unknown"""
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or "").lower()
+    if host.endswith("youtu.be"):
+        return parsed.path.lstrip("/").split("/")[0] or None
+    if "youtube" in host:
+        query_id = parse_qs(parsed.query).get("v")
+        if query_id:
+            return query_id[0]
+        parts = [part for part in parsed.path.split("/") if part]
+        if len(parts) >= 2 and parts[0] in ("shorts", "embed", "live", "v"):
+            return parts[1]
+    return None
+
+
+class TranscriptCache:
+    """On-disk transcript cache with size-based LRU eviction.
+
+    Transcripts are stored as JSON files named by their content key; an SQLite
+    index tracks sizes, access times, the URL -> video id mapping and hit/miss
+    counters.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite3"), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY, size INTEGER NOT NULL, last_access REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+            CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, video_id TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS videos (
+                video_id TEXT NOT NULL, params_key TEXT NOT NULL, key TEXT NOT NULL,
+                PRIMARY KEY (video_id, params_key));
+            CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+        self._db.commit()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _count(self, name):
+        self._db.execute(
+            "INSERT INTO stats (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,))
+
+    def _read(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            # Index and files drifted apart (manual cleanup, crash), drop the entry
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+
+    def get(self, key):
+        with self._lock:
+            value = None
+            if self._db.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone():
+                value = self._read(key)
+            if value is None:
+                self._count("misses")
+            else:
+                self._count("hits")
+                self._db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            return value
+
+    def put(self, key, transcript):
+        payload = json.dumps(transcript, ensure_ascii=False).encode("utf-8")
+        # Write to a temp file and rename so readers never see a partial transcript
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            file.write(payload)
+        os.replace(temp_path, self._path(key))
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, size, last_access) VALUES (?, ?, ?)",
+                (key, len(payload), time.time()))
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._db.execute("DELETE FROM videos WHERE key = ?", (key,))
+            self._count("evictions")
+            total -= size
+
+    def video_id_for_url(self, url):
+        row = self._db.execute("SELECT video_id FROM urls WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else extract_video_id(url)
+
+    def url_key(self, url, params):
+        """Cache key linked to the URL's video under these params, or None"""
+        with self._lock:
+            video_id = self.video_id_for_url(url)
+            if not video_id:
+                return None
+            row = self._db.execute(
+                "SELECT key FROM videos WHERE video_id = ? AND params_key = ?",
+                (video_id, params_key(params))).fetchone()
+        return row[0] if row else None
+
+    def get_for_url(self, url, params):
+        """Look up a transcript by URL without downloading anything"""
+        key = self.url_key(url, params)
+        if key is None:
+            with self._lock:
+                self._count("url_misses")
+                self._db.commit()
+            return None
+        value = self.get(key)
+        if value is not None:
+            with self._lock:
+                self._count("downloads_skipped")
+                self._db.commit()
+        return value
+
+    def link_url(self, url, params, key, video_id=None):
+        video_id = video_id or extract_video_id(url) or url
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO urls (url, video_id) VALUES (?, ?)", (url, video_id))
+            self._db.execute(
+                "INSERT OR REPLACE INTO videos (video_id, params_key, key) VALUES (?, ?, ?)",
+                (video_id, params_key(params), key))
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._db.execute("SELECT name, value FROM stats").fetchall())
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "url_misses": counters.get("url_misses", 0),
+            "downloads_skipped": counters.get("downloads_skipped", 0),
+            "evictions": counters.get("evictions", 0),
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,504 @@
+import concurrent.futures
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+from audio_preprocess import UPLOAD_FORMAT, encode, encode_file, preprocess
+from hedging import HEDGE_REQUESTS, hedged
+from language_router import LANGUAGE_ROUTING, TRANSCRIPTION_LANGUAGE, LanguageRouter
+from metrics import metrics
+from spool import SPOOL_UPLOADS, SpooledAudio, open_payload, spool_directory
+from vad import VAD_ENABLED, group_regions, pack_pcm, packed_seconds, remap_time, speech_regions
+
+# Default transcription settings shared by all the scripts
+DEFAULT_MODEL = "whisper-large-v3-turbo"
+# verbose_json returns segment (and optionally word) timestamps we chunk on
+DEFAULT_RESPONSE_FORMAT = "verbose_json"
+DEFAULT_TIMESTAMP_GRANULARITIES = ("segment",)
+
+# Segments are cut at most this long, preferring a silence near the limit
+MAX_SEGMENT_SECONDS = 600
+# How far back from the hard limit we look for a silence to cut on
+SILENCE_SEARCH_SECONDS = 30
+MIN_SILENCE_MS = 500
+# Silence is anything this many dB below the average loudness of the file
+SILENCE_OFFSET_DB = 16
+# Groq rejects uploads above 25 MB, stay well below it
+MAX_SEGMENT_BYTES = 20 * 1024 * 1024
+DEFAULT_WORKERS = 4
+# Files larger than this are decoded as a stream rather than all at once, so memory stays flat
+STREAM_DECODE_BYTES = int(os.getenv("STREAM_DECODE_BYTES", 8 * 1024 * 1024))
+# Jobs still running after this many seconds return what they have, with the gaps marked (0: no limit)
+JOB_DEADLINE_SECONDS = float(os.getenv("JOB_DEADLINE_SECONDS", 0))
+
+
+@dataclass
+class Segment:
+    """A piece of the source audio, positioned on the original timeline (seconds)"""
+    index: int
+    start: float
+    end: float
+    filename: str
+    # Encoded upload: bytes, or a SpooledAudio file on disk
+    data: bytes
+    # VAD-packed uploads: (packed_start, original_start, length) per speech region; [] means no speech
+    spans: list = None
+
+    def audio_seconds(self):
+        """Seconds of audio actually uploaded"""
+        if self.spans is not None:
+            return packed_seconds(self.spans)
+        return self.end - self.start
+
+
+@dataclass
+class SegmentResult:
+    index: int
+    start: float
+    end: float
+    text: str
+    segments: list = field(default_factory=list)
+    words: list = field(default_factory=list)
+    sent_seconds: float = 0.0
+    # Not transcribed before the job's deadline; text holds the gap marker
+    missing: bool = False
+
+
+@dataclass
+class Transcript:
+    text: str
+    segments: list
+    duration: float
+    results: list = field(default_factory=list)
+    words: list = field(default_factory=list)
+    # Audio seconds uploaded for transcription, against duration seconds of source audio
+    sent_seconds: float = 0.0
+    # Pinned language (ISO-639-1) and whether a Tanglish pass is needed, when a router decided them
+    language: str = None
+    transliterate: bool = None
+    # Spans ({start, end}) left untranscribed when the job hit its deadline
+    missing: list = field(default_factory=list)
+
+
+def transcript_to_dict(transcript):
+    """JSON-safe form of a Transcript, as stored in the cache and returned by the API"""
+    return {
+        "text": transcript.text,
+        "segments": transcript.segments,
+        "words": transcript.words,
+        "duration": transcript.duration,
+        # Audio seconds actually uploaded after VAD gating
+        "sent_seconds": transcript.sent_seconds,
+        "language": transcript.language,
+        "transliterate": transcript.transliterate,
+        "missing": transcript.missing,
+    }
+
+
+def make_groq_transcriber(client, model=DEFAULT_MODEL, prompt=None, response_format=DEFAULT_RESPONSE_FORMAT,
+                          temperature=0.0, language=None,
+                          timestamp_granularities=DEFAULT_TIMESTAMP_GRANULARITIES):
+    """Build a transcribe(filename, data, **options) callable around a Groq client.
+
+    options may carry per-call "prompt" and "language" overrides; other keys
+    (such as "duration") are metadata for wrappers and are ignored here.
+    """
+    def transcribe(filename, data, **options):
+        kwargs = {
+            "model": model,
+            "response_format": response_format,
+            "temperature": temperature,
+        }
+        if response_format == "verbose_json" and timestamp_granularities:
+            kwargs["timestamp_granularities"] = list(timestamp_granularities)
+        call_prompt = options.get("prompt") or prompt
+        call_language = options.get("language") or language
+        if call_prompt:
+            kwargs["prompt"] = call_prompt
+        if call_language:
+            kwargs["language"] = call_language
+        # A file object is streamed by httpx in small chunks instead of being copied into the request
+        with open_payload(data) as f:
+            return client.audio.transcriptions.create(file=(filename, f), **kwargs)
+    return transcribe
+
+
+def response_field(response, name, default=None):
+    # Groq returns pydantic models, fakes and cached results are plain dicts
+    if response is None:
+        return default
+    if isinstance(response, dict):
+        return response.get(name, default)
+    return getattr(response, name, default)
+
+
+def plan_segments(duration_ms, find_silences, max_segment_ms, search_window_ms):
+    """Return (start_ms, end_ms) bounds covering the audio, cut on silences where possible.
+
+    find_silences(start_ms, end_ms) returns the silent ranges inside that window,
+    in absolute milliseconds and in order.
+    """
+    bounds = []
+    start = 0
+    while duration_ms - start > max_segment_ms:
+        hard_end = start + max_segment_ms
+        window_start = max(start + max_segment_ms // 2, hard_end - search_window_ms)
+        silences = find_silences(window_start, hard_end)
+        if silences:
+            # Cut in the middle of the latest silence so segments stay as long as possible
+            silence_start, silence_end = silences[-1]
+            cut = (silence_start + silence_end) // 2
+        else:
+            cut = hard_end
+        bounds.append((start, cut))
+        start = cut
+    if duration_ms > start:
+        bounds.append((start, duration_ms))
+    return bounds
+
+
+def encode_segment(audio, filename, spool_dir=None):
+    """Upload payload for one segment: bytes, or a SpooledAudio written into spool_dir"""
+    if spool_dir is None:
+        return encode(audio)
+    return SpooledAudio(encode_file(audio, os.path.join(spool_dir, filename)))
+
+
+def split_audio_on_silence(file_path, max_segment_seconds=MAX_SEGMENT_SECONDS,
+                           max_segment_bytes=MAX_SEGMENT_BYTES, trim_silence=False, vad=False, stats=None,
+                           spool_dir=None):
+    """Decode the file and split it into bounded, encoded segments.
+
+    With vad, only speech regions are uploaded, packed together into segments;
+    stats (a dict) receives the audio_seconds and sent_seconds totals. With
+    spool_dir, segments are encoded into files there instead of into memory.
+    """
+    with metrics.span("preprocess"):
+        return _split_audio(file_path, max_segment_seconds, max_segment_bytes, trim_silence, vad, stats,
+                            spool_dir)
+
+
+def _split_audio(file_path, max_segment_seconds, max_segment_bytes, trim_silence, vad, stats, spool_dir):
+    from pydub import AudioSegment
+    from pydub.silence import detect_silence
+
+    # Downmix to 16 kHz mono (and optionally trim silent ends) before anything is encoded
+    audio, lead_ms = preprocess(AudioSegment.from_file(file_path), trim=trim_silence)
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    if stats is not None:
+        stats["audio_seconds"] = (lead_ms + len(audio)) / 1000.0
+    if vad:
+        segments = split_speech(audio, lead_ms / 1000.0, base_name, max_segment_seconds, max_segment_bytes,
+                                spool_dir)
+        if stats is not None:
+            stats["sent_seconds"] = sum(segment.audio_seconds() for segment in segments)
+        print(f"Split {file_path} into {len(segments)} speech segments")
+        return segments
+
+    silence_thresh = audio.dBFS - SILENCE_OFFSET_DB
+
+    def find_silences(start_ms, end_ms):
+        window = audio[start_ms:end_ms]
+        return [(start_ms + s, start_ms + e)
+                for s, e in detect_silence(window, min_silence_len=MIN_SILENCE_MS,
+                                           silence_thresh=silence_thresh, seek_step=10)]
+
+    bounds = plan_segments(len(audio), find_silences, max_segment_seconds * 1000,
+                           SILENCE_SEARCH_SECONDS * 1000)
+
+    segments = []
+    pending = list(bounds)
+    while pending:
+        start_ms, end_ms = pending.pop(0)
+        filename = f"{base_name}_{len(segments):04d}.{UPLOAD_FORMAT}"
+        data = encode_segment(audio[start_ms:end_ms], filename, spool_dir)
+        if len(data) > max_segment_bytes and end_ms - start_ms > 2 * MIN_SILENCE_MS:
+            # Still too big for one upload, halve it and try again
+            middle = (start_ms + end_ms) // 2
+            pending[0:0] = [(start_ms, middle), (middle, end_ms)]
+            continue
+        index = len(segments)
+        segments.append(Segment(
+            index=index,
+            start=(lead_ms + start_ms) / 1000.0,
+            end=(lead_ms + end_ms) / 1000.0,
+            filename=filename,
+            data=data,
+        ))
+    if stats is not None:
+        stats["sent_seconds"] = sum(segment.audio_seconds() for segment in segments)
+    print(f"Split {file_path} into {len(segments)} segments")
+    return segments
+
+
+def split_speech(audio, offset, base_name, max_segment_seconds=MAX_SEGMENT_SECONDS,
+                 max_segment_bytes=MAX_SEGMENT_BYTES, spool_dir=None):
+    """Segments holding only the speech regions of a preprocessed AudioSegment"""
+    import numpy as np
+
+    pcm = audio.raw_data
+    regions = [(offset + start, offset + end)
+               for start, end in speech_regions(np.frombuffer(pcm, dtype=np.int16), audio.frame_rate)]
+
+    segments = []
+    pending = group_regions(regions, max_segment_seconds)
+    while pending:
+        group = pending.pop(0)
+        packed, spans = pack_pcm(pcm, group, offset=offset, sample_rate=audio.frame_rate)
+        filename = f"{base_name}_{len(segments):04d}.{UPLOAD_FORMAT}"
+        data = encode_segment(audio._spawn(packed), filename, spool_dir)
+        if len(data) > max_segment_bytes and len(group) > 1:
+            # Still too big for one upload, split the regions in two and try again
+            middle = len(group) // 2
+            pending[0:0] = [group[:middle], group[middle:]]
+            continue
+        index = len(segments)
+        segments.append(Segment(
+            index=index,
+            start=group[0][0],
+            end=group[-1][1],
+            filename=filename,
+            data=data,
+            spans=spans,
+        ))
+    return segments
+
+
+def missing_marker(start, end=None):
+    if end is None:
+        return f"[missing from {start:.1f}s]"
+    return f"[missing {start:.1f}s-{end:.1f}s]"
+
+
+def missing_result(segment):
+    """Stand-in for a segment the job gave up on at its deadline"""
+    return SegmentResult(index=segment.index, start=segment.start, end=segment.end,
+                         text=missing_marker(segment.start, segment.end), missing=True)
+
+
+def deadline_remaining(deadline):
+    """Seconds left before a monotonic deadline (None: no deadline)"""
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def transcribe_segment(segment, transcribe_fn, router=None, cancel=None):
+    if segment.spans == []:
+        # VAD found no speech: nothing to send
+        return SegmentResult(index=segment.index, start=segment.start, end=segment.end, text="")
+    options = router.options_for(segment) if router else {}
+    if cancel is not None:
+        options["cancel"] = cancel
+    response = transcribe_fn(segment.filename, segment.data, duration=segment.audio_seconds(), **options)
+    if isinstance(segment.data, SpooledAudio):
+        # Sent: free the disk space now rather than when the whole job ends
+        segment.data.discard()
+    text = (response_field(response, "text") or "").strip()
+
+    # Move timestamped segments and words from upload-local time to the original timeline
+    if segment.spans:
+        segments = remap_timestamps(response_field(response, "segments"), segment.spans)
+        words = remap_timestamps(response_field(response, "words"), segment.spans)
+    else:
+        segments = shift_timestamps(response_field(response, "segments"), segment.start)
+        words = shift_timestamps(response_field(response, "words"), segment.start)
+    result = SegmentResult(index=segment.index, start=segment.start, end=segment.end, text=text,
+                           segments=segments, words=words, sent_seconds=segment.audio_seconds())
+    if router:
+        router.record(result)
+    return result
+
+
+def shift_timestamps(items, offset):
+    shifted = []
+    for item in items or []:
+        item = dict(item) if isinstance(item, dict) else dict(vars(item))
+        item["start"] = float(item.get("start", 0.0)) + offset
+        item["end"] = float(item.get("end", 0.0)) + offset
+        shifted.append(item)
+    return shifted
+
+
+def remap_timestamps(items, spans):
+    remapped = []
+    for item in items or []:
+        item = dict(item) if isinstance(item, dict) else dict(vars(item))
+        item["start"] = remap_time(float(item.get("start", 0.0)), spans)
+        item["end"] = max(item["start"], remap_time(float(item.get("end", 0.0)), spans))
+        remapped.append(item)
+    return remapped
+
+
+def has_speech(segment):
+    return segment.spans != [] and len(segment.data) > 0
+
+
+def transcribe_segments(segments, transcribe_fn, max_workers=DEFAULT_WORKERS, on_segment=None, router=None,
+                        deadline=None):
+    """Transcribe segments through a bounded worker pool, returning results in order.
+
+    With a router, the language is probed on the first segment with speech before any are sent.
+    At the deadline (time.monotonic()), unfinished calls are cancelled and their
+    segments come back as missing results instead.
+    """
+    cancel = None
+    timer = None
+    if deadline is not None:
+        # Fires at the deadline, so the probe and calls waiting for quota give up too
+        cancel = threading.Event()
+        timer = threading.Timer(deadline_remaining(deadline), cancel.set)
+        timer.daemon = True
+        timer.start()
+    if router:
+        first = next((segment for segment in segments if has_speech(segment)), None)
+        if first:
+            router.detect(first, transcribe_fn, cancel=cancel)
+    results = []
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = {executor.submit(transcribe_segment, segment, transcribe_fn, router, cancel): segment
+               for segment in segments}
+    try:
+        for future in as_completed(futures, timeout=deadline_remaining(deadline)):
+            if cancel is not None and cancel.is_set() and future.exception() is not None:
+                # Cancelled at the deadline: marked missing below
+                continue
+            result = future.result()
+            results.append(result)
+            if on_segment:
+                on_segment(result)
+    except concurrent.futures.TimeoutError:
+        cancel.set()
+    finally:
+        # Past the deadline, calls still on the wire are abandoned rather than waited for
+        timed_out = cancel is not None and cancel.is_set()
+        executor.shutdown(wait=not timed_out, cancel_futures=timed_out)
+        if timer is not None:
+            timer.cancel()
+    finished = {result.index for result in results}
+    unfinished = [segment for segment in futures.values() if segment.index not in finished]
+    if unfinished:
+        print(f"Deadline reached with {len(unfinished)} of {len(segments)} segments unfinished")
+        results.extend(missing_result(segment) for segment in unfinished)
+    results.sort(key=lambda result: result.index)
+    return results
+
+
+def stitch_results(results):
+    text = " ".join(result.text for result in results if result.text)
+    segments = []
+    words = []
+    missing = []
+    for result in results:
+        words.extend(result.words)
+        if result.missing:
+            # Keep the gap visible in the segments (and so in chunks and subtitles)
+            segments.append({"start": result.start, "end": result.end, "text": result.text, "missing": True})
+            words.append({"word": result.text, "start": result.start, "end": result.end, "missing": True})
+            missing.append({"start": result.start, "end": result.end})
+            metrics.count("pipeline_missing_seconds_total", result.end - result.start)
+        elif result.segments:
+            segments.extend(result.segments)
+        elif result.text:
+            # No timestamps from the API, fall back to the whole segment span
+            segments.append({"start": result.start, "end": result.end, "text": result.text})
+    if all(word.get("missing") for word in words):
+        # No word timestamps to place the markers among; the segments carry them
+        words = []
+    duration = results[-1].end if results else 0.0
+    sent_seconds = sum(result.sent_seconds for result in results)
+    return Transcript(text=text, segments=segments, duration=duration, results=results, words=words,
+                      sent_seconds=sent_seconds, missing=missing)
+
+
+def report_sent_audio(transcript):
+    metrics.count("pipeline_audio_seconds_total", transcript.duration, kind="source")
+    metrics.count("pipeline_audio_seconds_total", transcript.sent_seconds, kind="sent")
+    if transcript.duration:
+        print(f"Sent {transcript.sent_seconds:.1f}s of {transcript.duration:.1f}s of audio "
+              f"({100.0 * transcript.sent_seconds / transcript.duration:.0f}%)")
+
+
+def make_router(route_language=LANGUAGE_ROUTING, language=TRANSCRIPTION_LANGUAGE):
+    """A per-job LanguageRouter, or None when routing is off and no language is pinned"""
+    if route_language or language:
+        return LanguageRouter(language=language)
+    return None
+
+
+def apply_routing(transcript, router):
+    if router:
+        transcript.language = router.language
+        transcript.transliterate = router.transliterate
+    return transcript
+
+
+def transcribe_long_audio(file_path, transcribe_fn, max_workers=DEFAULT_WORKERS,
+                          max_segment_seconds=MAX_SEGMENT_SECONDS, on_segment=None, trim_silence=False,
+                          vad=VAD_ENABLED, spool=SPOOL_UPLOADS, stream_decode_bytes=STREAM_DECODE_BYTES,
+                          route_language=LANGUAGE_ROUTING, language=TRANSCRIPTION_LANGUAGE, hedge=HEDGE_REQUESTS,
+                          deadline_seconds=JOB_DEADLINE_SECONDS, deadline=None):
+    """Split, transcribe concurrently and stitch a long audio file.
+
+    Encoded segments are spooled to disk and uploaded from there, and files over
+    stream_decode_bytes are decoded as a stream, so memory does not grow with
+    the file size (trim_silence is left to VAD on that path). With
+    route_language, the language is probed once and pinned for every segment.
+    With hedge, straggling calls get a duplicate; after deadline_seconds (or at
+    an absolute time.monotonic() deadline) the transcript is returned with the
+    unfinished spans marked missing.
+    """
+    if deadline is None and deadline_seconds:
+        deadline = time.monotonic() + deadline_seconds
+    if hedge:
+        transcribe_fn = hedged(transcribe_fn)
+    router = make_router(route_language, language)
+    with spool_directory(spool) as spool_dir:
+        if streams_file(file_path, stream_decode_bytes):
+            return transcribe_file_stream(file_path, transcribe_fn, max_workers=max_workers,
+                                          max_segment_seconds=max_segment_seconds, on_segment=on_segment,
+                                          vad=vad, spool_dir=spool_dir, router=router, deadline=deadline)
+        return _transcribe_decoded(file_path, transcribe_fn, max_workers, max_segment_seconds, on_segment,
+                                   trim_silence, vad, spool_dir, router, deadline)
+
+
+def streams_file(file_path, stream_decode_bytes=STREAM_DECODE_BYTES):
+    """Whether a file is big enough to decode as a stream, and can be (ffmpeg, or WAV ready as-is)"""
+    from streaming_pipeline import can_decode_file
+
+    if not stream_decode_bytes or os.path.getsize(file_path) <= stream_decode_bytes:
+        return False
+    return can_decode_file(file_path)
+
+
+def transcribe_file_stream(file_path, transcribe_fn, max_workers=DEFAULT_WORKERS,
+                           max_segment_seconds=MAX_SEGMENT_SECONDS, on_segment=None, vad=VAD_ENABLED,
+                           spool_dir=None, router=None, deadline=None):
+    """Transcribe a local file through the streaming decoder: only a few segments are ever in memory"""
+    from streaming_pipeline import STREAM_SEGMENT_SECONDS, decode_file, transcribe_pcm
+
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    transcript, _ = transcribe_pcm(decode_file(file_path), transcribe_fn, max_workers=max_workers,
+                                   segment_seconds=min(max_segment_seconds, STREAM_SEGMENT_SECONDS),
+                                   on_segment=on_segment, vad=vad, spool_dir=spool_dir, name=base_name,
+                                   router=router, route_language=False, language=None, hedge=False,
+                                   deadline=deadline)
+    return transcript
+
+
+def _transcribe_decoded(file_path, transcribe_fn, max_workers, max_segment_seconds, on_segment, trim_silence,
+                        vad, spool_dir, router, deadline):
+    started = time.perf_counter()
+    stats = {}
+    segments = split_audio_on_silence(file_path, max_segment_seconds=max_segment_seconds,
+                                      trim_silence=trim_silence, vad=vad, stats=stats, spool_dir=spool_dir)
+    results = transcribe_segments(segments, transcribe_fn, max_workers=max_workers,
+                                  on_segment=on_segment, router=router, deadline=deadline)
+    transcript = apply_routing(stitch_results(results), router)
+    # Gated segments leave out the tail, so take the length from the decoded audio
+    transcript.duration = stats["audio_seconds"]
+    print(f"Transcribed {len(segments)} segments in {time.perf_counter() - started:.1f}s")
+    report_sent_audio(transcript)
+    return transcript
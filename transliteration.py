@@ -0,0 +1,81 @@
+import re
+from functools import lru_cache
+
+from core import get_sanscript
+
+# Tamil Unicode block; everything outside it passes through untouched
+TAMIL_START = 0x0B80
+TAMIL_END = 0x0BFF
+TAMIL_RUN = re.compile(f"[{chr(TAMIL_START)}-{chr(TAMIL_END)}]+")
+
+# Names accepted by the UI/API, mapped to indic_transliteration scheme ids
+SCHEMES = {
+    "itrans": "itrans",
+    "iso": "iso",
+    "iast": "iast",
+}
+DEFAULT_SCHEME = "itrans"
+
+# Bounded memo tables: a transcript repeats the same words and lines a lot
+TOKEN_CACHE_SIZE = 65536
+LINE_CACHE_SIZE = 4096
+
+
+def contains_tamil(text):
+    """True if any character falls in the Tamil block (single C-level regex scan)"""
+    return bool(text) and TAMIL_RUN.search(text) is not None
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def transliterate_token(token, scheme):
+    sanscript = get_sanscript()
+    return sanscript.transliterate(token, sanscript.TAMIL, SCHEMES[scheme])
+
+
+@lru_cache(maxsize=LINE_CACHE_SIZE)
+def _transliterate_line(text, schemes):
+    outputs = [[] for _ in schemes]
+    position = 0
+    # One scan over the text: copy non-Tamil runs, transliterate Tamil runs per scheme
+    for match in TAMIL_RUN.finditer(text):
+        gap = text[position:match.start()]
+        token = match.group(0)
+        for output, scheme in zip(outputs, schemes):
+            output.append(gap)
+            output.append(transliterate_token(token, scheme))
+        position = match.end()
+    tail = text[position:]
+    return tuple("".join(output) + tail for output in outputs)
+
+
+def transliterate_multi(text, schemes=(DEFAULT_SCHEME,)):
+    """Transliterate Tamil text into several schemes at once; returns {scheme: text}"""
+    schemes = tuple(schemes)
+    for scheme in schemes:
+        if scheme not in SCHEMES:
+            raise ValueError(f"Unknown transliteration scheme: {scheme}")
+    if not contains_tamil(text):
+        return {scheme: text for scheme in schemes}
+    return dict(zip(schemes, _transliterate_line(text, schemes)))
+
+
+def transliteration_needed(transcript):
+    """Whether a Tanglish pass has anything to do: the language router's up-front call, else a Tamil script scan"""
+    decided = transcript.get("transliterate")
+    if decided is not None:
+        return decided
+    return contains_tamil(transcript.get("text"))
+
+
+def transliterate(text, scheme=DEFAULT_SCHEME):
+    return transliterate_multi(text, (scheme,))[scheme]
+
+
+def transliterate_chunks(chunks, schemes=(DEFAULT_SCHEME,)):
+    """Copy of the chunks with a "transliterations" entry ({scheme: text}) on each"""
+    return [dict(chunk, transliterations=transliterate_multi(chunk["text"], schemes)) for chunk in chunks]
+
+
+def cache_info():
+    return {"tokens": transliterate_token.cache_info()._asdict(),
+            "lines": _transliterate_line.cache_info()._asdict()}
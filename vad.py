@@ -0,0 +1,153 @@
+import bisect
+import os
+
+# Frame-wise energy VAD over 16 kHz mono 16-bit PCM, all in NumPy
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+# A frame is speech if it is this far above the noise floor...
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", 12))
+NOISE_FLOOR_PERCENTILE = 10
+# ...never quieter than this absolute level...
+MIN_SPEECH_DBFS = -50.0
+# ...and most of its energy is in the voice band (drops bass-, drum- and cymbal-only passages)
+SPEECH_BAND_HZ = (100, 4000)
+MIN_SPEECH_BAND_RATIO = 0.5
+
+# Smoothing: short blips are ignored, short pauses stay inside a region
+MIN_SPEECH_MS = 250
+MIN_PAUSE_MS = 700
+PAD_MS = 200
+# Silence put between regions packed into one upload, so Whisper still hears a pause
+PACK_GAP_MS = 300
+
+VAD_ENABLED = os.getenv("VAD_ENABLED", "1") == "1"
+# Audio analysed per block: bounds the feature pass's memory on long files
+FEATURE_BLOCK_SECONDS = 90
+FEATURE_BLOCK_FRAMES = FEATURE_BLOCK_SECONDS * 1000 // FRAME_MS
+
+
+def frame_features(samples, sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS, block_frames=FEATURE_BLOCK_FRAMES):
+    """Per-frame loudness (dBFS) and share of spectral energy in the voice band.
+
+    Frames are processed block_frames at a time, so the float copies and the
+    spectrum never cover more than one block of the audio.
+    """
+    import numpy as np
+
+    frame = sample_rate * frame_ms // 1000
+    count = len(samples) // frame
+    energy_db = np.zeros(count)
+    band_ratio = np.zeros(count)
+    if count == 0:
+        return energy_db, band_ratio
+    window = np.hanning(frame)
+    frequencies = np.fft.rfftfreq(frame, 1.0 / sample_rate)
+    band = (frequencies >= SPEECH_BAND_HZ[0]) & (frequencies <= SPEECH_BAND_HZ[1])
+    for first in range(0, count, block_frames):
+        last = min(count, first + block_frames)
+        frames = samples[first * frame:last * frame].astype(np.float32).reshape(last - first, frame) / 32768.0
+        energy_db[first:last] = 10 * np.log10(np.mean(np.square(frames), axis=1) + 1e-10)
+        spectrum = np.square(np.abs(np.fft.rfft(frames * window, axis=1)))
+        band_ratio[first:last] = spectrum[:, band].sum(axis=1) / (spectrum.sum(axis=1) + 1e-10)
+    return energy_db, band_ratio
+
+
+def speech_regions(samples, sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS):
+    """[(start, end)] in seconds of the parts of samples (int16 array) that contain speech"""
+    import numpy as np
+
+    energy_db, band_ratio = frame_features(samples, sample_rate, frame_ms)
+    if len(energy_db) == 0:
+        return []
+    threshold = max(np.percentile(energy_db, NOISE_FLOOR_PERCENTILE) + VAD_THRESHOLD_DB, MIN_SPEECH_DBFS)
+    voiced = (energy_db >= threshold) & (band_ratio >= MIN_SPEECH_BAND_RATIO)
+
+    # Runs of voiced frames, as [start, end) frame indices
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], voiced.astype(np.int8), [0]))))
+    runs = edges.reshape(-1, 2).tolist()
+
+    min_pause = MIN_PAUSE_MS // frame_ms
+    merged = []
+    for start, end in runs:
+        if merged and start - merged[-1][1] < min_pause:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    pad = PAD_MS / 1000.0
+    total = len(samples) / sample_rate
+    regions = []
+    for start, end in merged:
+        if (end - start) * frame_ms < MIN_SPEECH_MS:
+            continue
+        start = max(0.0, start * frame_ms / 1000.0 - pad)
+        end = min(total, end * frame_ms / 1000.0 + pad)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+
+def group_regions(regions, max_seconds, gap_seconds=PACK_GAP_MS / 1000.0):
+    """Pack consecutive regions into uploads of at most max_seconds (long regions are cut)"""
+    groups = []
+    current = []
+    length = 0.0
+    for start, end in regions:
+        while end - start > 0:
+            room = max_seconds - length - (gap_seconds if current else 0.0)
+            if room <= 0:
+                groups.append(current)
+                current, length = [], 0.0
+                continue
+            piece_end = min(end, start + room)
+            length += (gap_seconds if current else 0.0) + piece_end - start
+            current.append((start, piece_end))
+            start = piece_end
+    if current:
+        groups.append(current)
+    return groups
+
+
+def pack_pcm(pcm, regions, offset=0.0, sample_rate=SAMPLE_RATE, gap_seconds=PACK_GAP_MS / 1000.0):
+    """Concatenate the regions of pcm (relative to offset) with short gaps between them.
+
+    Returns (packed pcm, spans), spans being (packed_start, original_start, length)
+    in seconds, which remap_time uses to put timestamps back on the original timeline.
+    """
+    bytes_per_second = sample_rate * 2
+    gap = b"\0" * (int(gap_seconds * sample_rate) * 2)
+    pieces = []
+    spans = []
+    position = 0.0
+    for start, end in regions:
+        if pieces:
+            pieces.append(gap)
+            position += gap_seconds
+        first = int((start - offset) * sample_rate) * 2
+        last = int((end - offset) * sample_rate) * 2
+        pieces.append(pcm[first:last])
+        spans.append((position, start, (last - first) / bytes_per_second))
+        position += (last - first) / bytes_per_second
+    return b"".join(pieces), spans
+
+
+def packed_seconds(spans):
+    if not spans:
+        return 0.0
+    packed_start, _, length = spans[-1]
+    return packed_start + length
+
+
+def remap_time(t, spans):
+    """Packed-upload time back to the original timeline (gaps snap to the next region)"""
+    index = bisect.bisect_right([span[0] for span in spans], t) - 1
+    if index < 0:
+        return spans[0][1]
+    packed_start, original_start, length = spans[index]
+    if t - packed_start <= length:
+        return original_start + (t - packed_start)
+    if index + 1 < len(spans):
+        return spans[index + 1][1]
+    return original_start + length
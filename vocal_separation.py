@@ -0,0 +1,172 @@
+import os
+import time
+from collections import deque
+
+from core import DEMUCS_MODEL, get_demucs_model, get_separation_pool
+from streaming_pipeline import SAMPLE_RATE, decode_stream, transcribe_pcm
+
+# Pretrained Demucs models all run on 44.1 kHz stereo
+DEMUCS_SAMPLE_RATE = 44100
+DEMUCS_CHANNELS = 2
+FLOAT_BYTES = 4
+
+# Long audio is cut into overlapping windows that are separated in parallel and
+# crossfaded back together, so no window boundary lands as an audible click
+WINDOW_SECONDS = 30
+OVERLAP_SECONDS = 2
+
+# Each worker process holds its own warm model, kept for the life of the process; torch threads are
+# split between them
+SEPARATION_WORKERS = int(os.getenv("SEPARATION_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+SEPARATION_THREADS = int(os.getenv("SEPARATION_THREADS", max(1, (os.cpu_count() or 1) // SEPARATION_WORKERS)))
+
+# Set in each worker by _init_worker
+_model = None
+
+
+def _init_worker(model_name, threads):
+    global _model
+    import torch
+
+    torch.set_num_threads(threads)
+    _model = get_demucs_model(model_name)
+
+
+def _separate_window(index, samples):
+    """Vocal stem of one (channels, frames) float32 window, as 16 kHz mono float32"""
+    import julius
+    import torch
+    from demucs.apply import apply_model
+
+    started = time.perf_counter()
+    wav = torch.from_numpy(samples)
+    # Same normalisation the demucs CLI applies before separating
+    reference = wav.mean(0)
+    mean, std = reference.mean(), reference.std() + 1e-8
+    with torch.no_grad():
+        sources = apply_model(_model, ((wav - mean) / std)[None], device="cpu", shifts=0, split=True,
+                              overlap=0.25, progress=False)[0]
+    vocals = sources[_model.sources.index("vocals")] * std + mean
+    mono = julius.resample_frac(vocals.mean(0), DEMUCS_SAMPLE_RATE, SAMPLE_RATE).numpy()
+
+    # Resampling can be off by a sample; pin the length so windows line up exactly
+    expected = round(samples.shape[1] * SAMPLE_RATE / DEMUCS_SAMPLE_RATE)
+    mono = mono[:expected]
+    if len(mono) < expected:
+        import numpy as np
+
+        mono = np.pad(mono, (0, expected - len(mono)))
+    return index, mono, time.perf_counter() - started
+
+
+def iter_windows(pcm_blocks, window_seconds=WINDOW_SECONDS, overlap_seconds=OVERLAP_SECONDS):
+    """(index, float32 array of shape (channels, frames)) for each overlapping window"""
+    import numpy as np
+
+    frame_bytes = DEMUCS_CHANNELS * FLOAT_BYTES
+    window_bytes = window_seconds * DEMUCS_SAMPLE_RATE * frame_bytes
+    step_bytes = (window_seconds - overlap_seconds) * DEMUCS_SAMPLE_RATE * frame_bytes
+    overlap_bytes = window_bytes - step_bytes
+
+    def frames(pcm):
+        # Interleaved f32le -> (channels, frames)
+        return np.frombuffer(bytes(pcm), dtype="<f4").reshape(-1, DEMUCS_CHANNELS).T.copy()
+
+    buffer = bytearray()
+    index = 0
+    for block in pcm_blocks:
+        buffer.extend(block)
+        while len(buffer) >= window_bytes:
+            yield index, frames(buffer[:window_bytes])
+            del buffer[:step_bytes]
+            index += 1
+    # Whatever is left past the previous window's overlap becomes a short last window
+    if index == 0 or len(buffer) > overlap_bytes:
+        usable = len(buffer) - len(buffer) % frame_bytes
+        if usable:
+            yield index, frames(buffer[:usable])
+
+
+class Crossfader:
+    """Joins overlapping windows into one continuous stream of s16le PCM"""
+
+    def __init__(self, overlap_seconds=OVERLAP_SECONDS):
+        self.overlap = overlap_seconds * SAMPLE_RATE
+        self.tail = None
+
+    def push(self, samples):
+        import numpy as np
+
+        if self.tail is not None:
+            length = min(len(self.tail), len(samples))
+            fade = np.linspace(0.0, 1.0, length, dtype=np.float32)
+            samples = samples.copy()
+            samples[:length] = self.tail[:length] * (1.0 - fade) + samples[:length] * fade
+        # Hold back the overlap until the next window arrives to blend with it
+        keep = min(self.overlap, len(samples))
+        self.tail = samples[len(samples) - keep:]
+        return self._to_pcm(samples[:len(samples) - keep])
+
+    def flush(self):
+        tail, self.tail = self.tail, None
+        return self._to_pcm(tail) if tail is not None else b""
+
+    @staticmethod
+    def _to_pcm(samples):
+        import numpy as np
+
+        return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+def separate_vocals(source, headers=None, workers=SEPARATION_WORKERS, threads=SEPARATION_THREADS,
+                    window_seconds=WINDOW_SECONDS, overlap_seconds=OVERLAP_SECONDS, model_name=DEMUCS_MODEL,
+                    stats=None):
+    """Yield the vocal stem of source as 16 kHz mono s16le blocks, in order.
+
+    Nothing is written to disk: ffmpeg decodes into windows, the pool separates
+    them, and the crossfaded vocals are handed on as soon as they are ready.
+    Per-window timings are appended to stats (a list) when given.
+    """
+    pcm_blocks = decode_stream(source, headers, sample_rate=DEMUCS_SAMPLE_RATE, channels=DEMUCS_CHANNELS,
+                               sample_format="f32le")
+    crossfader = Crossfader(overlap_seconds)
+    started = time.perf_counter()
+    total_audio = 0.0
+
+    def finish(future):
+        nonlocal total_audio
+        index, vocals, elapsed = future.result()
+        audio_seconds = len(vocals) / SAMPLE_RATE
+        total_audio += audio_seconds
+        print(f"Separated window {index}: {audio_seconds:.1f}s of audio in {elapsed:.1f}s "
+              f"({audio_seconds / elapsed:.2f}x realtime)")
+        if stats is not None:
+            stats.append({"index": index, "audio_seconds": audio_seconds, "seconds": elapsed})
+        return crossfader.push(vocals)
+
+    # The pool outlives this call: its workers load the model once and stay warm for the next file
+    pool = get_separation_pool(model_name, workers, threads)
+    # Keep a couple of windows per worker queued, no more, so memory stays flat
+    pending = deque()
+    try:
+        for index, samples in iter_windows(pcm_blocks, window_seconds, overlap_seconds):
+            pending.append(pool.submit(_separate_window, index, samples))
+            if len(pending) >= workers * 2:
+                yield finish(pending.popleft())
+        while pending:
+            yield finish(pending.popleft())
+    finally:
+        # A consumer that stops early must not leave its windows queued on the shared pool
+        for future in pending:
+            future.cancel()
+    yield crossfader.flush()
+
+    elapsed = time.perf_counter() - started
+    if elapsed > 0:
+        print(f"Separated {total_audio:.1f}s of audio in {elapsed:.1f}s ({total_audio / elapsed:.2f}x realtime)")
+
+
+def transcribe_vocals(source, transcribe_fn, headers=None, on_segment=None, **separation_options):
+    """Separate the vocals of a file or URL and transcribe them; returns (Transcript, sha256 of the vocals)"""
+    return transcribe_pcm(separate_vocals(source, headers, **separation_options), transcribe_fn,
+                          on_segment=on_segment)
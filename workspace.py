@@ -0,0 +1,77 @@
+import os
+import shutil
+import time
+import uuid
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKSPACE_ROOT = os.path.join(BASE_DIR, "downloads")
+OUTPUT_ROOT = os.path.join(BASE_DIR, "transcription_chunks")
+# Workspaces left behind by crashed or abandoned jobs are removed after this long
+WORKSPACE_TTL_SECONDS = int(os.getenv("WORKSPACE_TTL_SECONDS", 6 * 60 * 60))
+
+
+class Workspace:
+    """Scratch directory owned by a single job"""
+
+    def __init__(self, manager, job_id, path):
+        self.manager = manager
+        self.id = job_id
+        self.path = path
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def output_dir(self):
+        """Per-job directory for results that outlive the scratch files"""
+        path = self.manager.output_path(self.id)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def cleanup(self):
+        self.manager.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+
+
+class WorkspaceManager:
+    def __init__(self, root=WORKSPACE_ROOT, output_root=OUTPUT_ROOT, ttl_seconds=WORKSPACE_TTL_SECONDS):
+        self.root = root
+        self.output_root = output_root
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(root, exist_ok=True)
+
+    def create(self, job_id=None):
+        # Opportunistically clear out expired workspaces before adding another
+        self.sweep_expired()
+        job_id = job_id or uuid.uuid4().hex
+        path = os.path.join(self.root, job_id)
+        os.makedirs(path, exist_ok=True)
+        return Workspace(self, job_id, path)
+
+    def output_path(self, job_id):
+        return os.path.join(self.output_root, job_id)
+
+    def release(self, workspace):
+        shutil.rmtree(workspace.path, ignore_errors=True)
+
+    def sweep_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        for entry in os.scandir(self.root):
+            try:
+                if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+            except OSError:
+                continue
+        if removed:
+            print(f"Removed {removed} expired workspaces from {self.root}")
+        return removed
+
+
+# Shared default manager for the scripts and the web app
+workspaces = WorkspaceManager()